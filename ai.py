@@ -1,150 +1,585 @@
-import copy
+import random
+import time
+import zlib
+from collections import namedtuple
+
+import bitboard
+from bitboard import TILE_LOW, TILE_HIGH, TILE_VALUE, TILE_DOUBLE
 
 class DifficultyLevel:
     EASY = 1
     MEDIUM = 2
     HARD = 3
 
-def evaluate_state(player_pieces, opponent_pieces, difficulty):
+# Chaves de Zobrist geradas com semente fixa, para que o hash de uma posição seja
+# o mesmo entre execuções e processos. Cobrem conjuntos de até duplo-12.
+ZOBRIST_MAX_DOTS = 12
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_TILES = [
+    {(a, b): _zobrist_rng.getrandbits(64)
+     for a in range(ZOBRIST_MAX_DOTS + 1) for b in range(a, ZOBRIST_MAX_DOTS + 1)}
+    for _ in range(2)
+]  # [0] peças do jogador raiz, [1] peças do oponente
+ZOBRIST_ENDS = [[_zobrist_rng.getrandbits(64) for _ in range(ZOBRIST_MAX_DOTS + 2)] for _ in range(2)]
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)
+
+# As mesmas chaves, indexadas pelo índice canônico da peça (bitboard.tile_index),
+# para a busca sobre máscaras de bits.
+ZOBRIST_MASK_TILES = [
+    [ZOBRIST_TILES[owner][(TILE_LOW[i], TILE_HIGH[i])] for i in range(bitboard.TILE_COUNT)]
+    for owner in range(2)
+]
+
+def _ends_hash(ends):
+    """Hash das extremidades do tabuleiro (None ocupa o índice 0)."""
+    left = 0 if ends[0] is None else ends[0] + 1
+    right = 0 if ends[1] is None else ends[1] + 1
+    return ZOBRIST_ENDS[0][left] ^ ZOBRIST_ENDS[1][right]
+
+class TranspositionTable:
+    """
+    Tabela de transposição de tamanho fixo.
+
+    Cada posição é guardada em uma única entrada (hash módulo tamanho). Uma entrada
+    ocupada só é substituída se for de uma busca anterior ou se a nova tiver
+    profundidade maior ou igual.
+    """
+    EXACT = 0
+    LOWER = 1  # o valor real é maior ou igual ao guardado
+    UPPER = 2  # o valor real é menor ou igual ao guardado
+
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.entries = [None] * size
+        self.generation = 0
+        self.hits = 0
+
+    def new_search(self):
+        """Marca o início de uma nova busca; entradas antigas passam a ser substituíveis."""
+        self.generation += 1
+
+    def clear(self):
+        """Esvazia a tabela."""
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """Retorna a entrada (key, depth, score, flag, move, generation) ou None."""
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        """Guarda o resultado de uma busca respeitando a política de substituição."""
+        idx = key % self.size
+        entry = self.entries[idx]
+        if entry is None or entry[0] == key or entry[5] != self.generation or depth >= entry[1]:
+            self.entries[idx] = (key, depth, score, flag, move, self.generation)
+
+class SearchTimeout(Exception):
+    """Levantada quando o orçamento de tempo ou de nós de uma busca se esgota."""
+
+class SearchBudget:
+    """
+    Orçamento de uma busca: limite de tempo (em segundos) e/ou de nós visitados.
+
+    O relógio só é consultado a cada CHECK_INTERVAL nós para não pesar na busca.
+    """
+    CHECK_INTERVAL = 256
+
+    def __init__(self, time_limit=None, node_limit=None):
+        self.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        self.nodes = 0
+
+    def tick(self):
+        """Conta um nó e levanta SearchTimeout se o orçamento acabou."""
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchTimeout()
+        if self.deadline is not None and self.nodes % self.CHECK_INTERVAL == 0 \
+                and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+# Pesos da avaliação. Uma posição vale, do ponto de vista do jogador:
+#
+#   value * (pontos do oponente - pontos do jogador)
+#   + count * (peças do oponente - peças do jogador)
+#   - double * duplas do jogador
+#   + high_value * peças do jogador com mais de high_threshold pontos
+#   - diversity * números diferentes na mão do jogador
+#
+# DEFAULT_WEIGHTS são os pesos escolhidos à mão para cada dificuldade; pesos
+# ajustados (ver tune.py) podem ser passados à busca no lugar deles.
+# high_threshold não é um peso, mas depende do conjunto de peças: o padrão 8
+# vale para o duplo-6 (ver weights_for_set).
+EvalWeights = namedtuple('EvalWeights', ('value', 'count', 'double', 'high_value', 'diversity', 'high_threshold'),
+                         defaults=(8,))
+
+DEFAULT_WEIGHTS = {
+    DifficultyLevel.EASY: EvalWeights(1, 0, 0, 0, 0),
+    DifficultyLevel.MEDIUM: EvalWeights(1, 3, 5, 0, 0),
+    DifficultyLevel.HARD: EvalWeights(1, 4, 8, 2, 3),
+}
+
+def eval_weights(difficulty, weights=None):
+    """Retorna weights, ou os pesos padrão da dificuldade se for None."""
+    return DEFAULT_WEIGHTS[difficulty] if weights is None else weights
+
+def weights_for_set(weights, max_dots):
+    """
+    Ajusta weights a um conjunto duplo-max_dots: são altas as peças com mais de
+    2/3 do valor da maior (8 pontos no duplo-6, 12 no duplo-9, 16 no duplo-12).
+    """
+    return weights._replace(high_threshold=4 * max_dots // 3)
+
+def weights_key(weights):
+    """Inteiro que identifica um vetor de pesos, igual em todos os processos (para chaves de cache)."""
+    return zlib.crc32(repr(tuple(weights)).encode())
+
+def evaluate_state(player_pieces, opponent_pieces, difficulty, weights=None):
     """
-    Avalia o estado do jogo com heurísticas avançadas baseadas no nível de dificuldade.
+    Avalia o estado do jogo com os pesos da dificuldade (ou weights, um EvalWeights).
+
+    É a definição de referência da avaliação, sobre listas de peças: a busca usa
+    evaluate_mask_state e EvalAggregates, que devem dar o mesmo valor (ver
+    test_ai.py).
     """
-    player_sum = sum(p.get_value() for p in player_pieces)
-    opponent_sum = sum(p.get_value() for p in opponent_pieces)
+    w = eval_weights(difficulty, weights)
+    player_sum = sum(p.value for p in player_pieces)
+    opponent_sum = sum(p.value for p in opponent_pieces)
+    score = (opponent_sum - player_sum) * w.value + (len(opponent_pieces) - len(player_pieces)) * w.count
     
-    if difficulty == DifficultyLevel.EASY:
-        # Avaliação simples - considera apenas os valores das peças
-        return opponent_sum - player_sum
+    # Duplas são estrategicamente valiosas
+    if w.double:
+        score -= sum(w.double for p in player_pieces if p.double)
+    if w.high_value:
+        score += sum(w.high_value for p in player_pieces if p.value > w.high_threshold)
     
-    elif difficulty == DifficultyLevel.MEDIUM:
-        # Avaliação média - considera quantidade de peças e valores
-        player_count_factor = len(player_pieces) * 3
-        opponent_count_factor = len(opponent_pieces) * 3
-        doubles_bonus = sum(5 for p in player_pieces if p.is_double())
-        return (opponent_sum + opponent_count_factor) - (player_sum + player_count_factor + doubles_bonus)
-    
-    else:  # HARD
-        # Avaliação avançada - considera múltiplos fatores estratégicos
-        player_count_factor = len(player_pieces) * 4
-        opponent_count_factor = len(opponent_pieces) * 4
-        
-        # Bônus por ter duplas (estrategicamente valiosas)
-        doubles_bonus = sum(8 for p in player_pieces if p.is_double())
-        
-        # Penalidade por ter peças de valor alto
-        high_value_penalty = sum(2 for p in player_pieces if p.get_value() > 8)
-        
-        # Bônus por ter números diversos (mais opções de jogada)
+    # Números diversos dão mais opções de jogada
+    if w.diversity:
         player_numbers = set()
         for p in player_pieces:
             player_numbers.add(p.left)
             player_numbers.add(p.right)
-        diversity_bonus = len(player_numbers) * 3
-        
-        return (opponent_sum + opponent_count_factor) - \
-               (player_sum + player_count_factor + doubles_bonus - high_value_penalty + diversity_bonus)
-
-def get_valid_moves(pieces, ends):
-    """Retorna as jogadas válidas para as peças e extremidades fornecidas."""
-    valid_moves = []
-    
-    for piece in pieces:
-        if ends[0] is None or piece.matches(ends[0]):
-            valid_moves.append((piece, 'left'))
-        if ends[1] is None or (piece.matches(ends[1]) and ends[0] != ends[1]):
-            valid_moves.append((piece, 'right'))
-    
-    return valid_moves
-
-def apply_move(board, piece, side, ends):
-    """Simula a aplicação de uma jogada e retorna o novo tabuleiro e extremidades."""
-    board = board.copy()
-    new_piece = piece
-    
-    if side == 'left':
-        if ends[0] is None:  # Primeira peça
-            board.append(new_piece)
-        elif piece.right == ends[0]:
-            board.insert(0, new_piece)
-        else:
-            board.insert(0, new_piece.flipped())
-    else:  # right
-        if ends[1] is None:  # Primeira peça
-            board.append(new_piece)
-        elif piece.left == ends[1]:
-            board.append(new_piece)
-        else:
-            board.append(new_piece.flipped())
+        score -= len(player_numbers) * w.diversity
+    return score
+
+def evaluate_mask_state(player_mask, opponent_mask, difficulty, weights=None):
+    """Equivalente a evaluate_state para mãos representadas como máscaras de bits."""
+    w = eval_weights(difficulty, weights)
+    high_threshold = w.high_threshold
+    player_sum = 0
+    player_count = 0
+    doubles = 0
+    high_values = 0
+    numbers = 0  # números presentes na mão, também como máscara
+    mask = player_mask
+    while mask:
+        low_bit = mask & -mask
+        mask ^= low_bit
+        idx = low_bit.bit_length() - 1
+        value = TILE_VALUE[idx]
+        player_sum += value
+        player_count += 1
+        if TILE_DOUBLE[idx]:
+            doubles += 1
+        if value > high_threshold:
+            high_values += 1
+        numbers |= (1 << TILE_LOW[idx]) | (1 << TILE_HIGH[idx])
     
-    if not board:
-        new_ends = (None, None)
-    elif len(board) == 1:
-        new_ends = (board[0].left, board[0].right)
-    else:
-        new_ends = (board[0].left, board[-1].right)
+    opponent_sum = 0
+    opponent_count = 0
+    mask = opponent_mask
+    while mask:
+        low_bit = mask & -mask
+        mask ^= low_bit
+        opponent_sum += TILE_VALUE[low_bit.bit_length() - 1]
+        opponent_count += 1
     
-    return board, new_ends
+    score = (opponent_sum - player_sum) * w.value + (opponent_count - player_count) * w.count
+    if w.double:
+        score -= doubles * w.double
+    if w.high_value:
+        score += high_values * w.high_value
+    if w.diversity:
+        score -= bin(numbers).count('1') * w.diversity
+    return score
+
+def _tile_weights(w):
+    """
+    Peso de cada peça na avaliação com os pesos w: ([mão do jogador], [mão do oponente]).
+
+    Os termos lineares de evaluate_mask_state (pontos, número de peças, duplas e
+    peças altas) são somas sobre as peças; o peso de uma peça é a sua
+    contribuição para esses termos.
+    """
+    return ([TILE_VALUE[i] * w.value + w.count + (w.double if TILE_DOUBLE[i] else 0)
+             - (w.high_value if TILE_VALUE[i] > w.high_threshold else 0) for i in range(bitboard.TILE_COUNT)],
+            [TILE_VALUE[i] * w.value + w.count for i in range(bitboard.TILE_COUNT)])
+
+TILE_WEIGHTS = {}  # EvalWeights -> _tile_weights, calculado no primeiro uso
+
+def tile_weights(w):
+    """Retorna os pesos por peça de um EvalWeights (ver _tile_weights), calculando-os uma única vez."""
+    tiles = TILE_WEIGHTS.get(w)
+    if tiles is None:
+        tiles = TILE_WEIGHTS[w] = _tile_weights(w)
+    return tiles
+
+class EvalAggregates:
+    """
+    Termos da avaliação mantidos incrementalmente durante a busca.
+
+    material guarda, para cada mão ([0] jogador raiz, [1] oponente), a soma de
+    pontos, peças, duplas e peças altas já ponderada pelos pesos (ver
+    tile_weights). Se o peso de diversidade não for zero, pip_counts conta
+    quantas peças do jogador raiz contêm cada número e numbers quantos números
+    estão presentes. Uma jogada tira exatamente uma peça de uma mão: remove e
+    restore atualizam os termos em O(1), e evaluate devolve o mesmo valor de
+    evaluate_mask_state sem percorrer as mãos. vector é o EvalWeights usado.
+    """
+
+    __slots__ = ('difficulty', 'vector', 'weights', 'diversity', 'material', 'pip_counts', 'numbers')
+
+    def __init__(self, root_mask, other_mask, difficulty, weights=None):
+        self.difficulty = difficulty
+        self.vector = eval_weights(difficulty, weights)
+        self.weights = tile_weights(self.vector)
+        self.diversity = self.vector.diversity
+        self.material = [0, 0]
+        self.pip_counts = [0] * (bitboard.MAX_DOTS + 1) if self.diversity else None
+        self.numbers = 0
+        for idx in bitboard.iter_tiles(root_mask):
+            self.restore(0, idx)
+        for idx in bitboard.iter_tiles(other_mask):
+            self.restore(1, idx)
+
+    def remove(self, owner, idx):
+        """Tira a peça idx da mão owner."""
+        self.material[owner] -= self.weights[owner][idx]
+        pips = self.pip_counts
+        if owner == 0 and pips is not None:
+            low = TILE_LOW[idx]
+            pips[low] -= 1
+            if not pips[low]:
+                self.numbers -= 1
+            high = TILE_HIGH[idx]
+            if high != low:
+                pips[high] -= 1
+                if not pips[high]:
+                    self.numbers -= 1
+
+    def restore(self, owner, idx):
+        """Devolve a peça idx à mão owner (desfaz remove)."""
+        self.material[owner] += self.weights[owner][idx]
+        pips = self.pip_counts
+        if owner == 0 and pips is not None:
+            low = TILE_LOW[idx]
+            if not pips[low]:
+                self.numbers += 1
+            pips[low] += 1
+            high = TILE_HIGH[idx]
+            if high != low:
+                if not pips[high]:
+                    self.numbers += 1
+                pips[high] += 1
+
+    def evaluate(self):
+        """Valor da posição do ponto de vista do jogador raiz (como evaluate_mask_state)."""
+        return self.material[1] - self.material[0] - self.numbers * self.diversity
+
+def _store_result(table, key, depth, score, move, alpha, beta):
+    """Guarda o valor de um nó na tabela com o tipo de limite adequado à janela."""
+    if score <= alpha:
+        flag = TranspositionTable.UPPER
+    elif score >= beta:
+        flag = TranspositionTable.LOWER
+    else:
+        flag = TranspositionTable.EXACT
+    table.store(key, depth, score, flag, move)
+
+# Ordem estática das peças: as de maior valor e as duplas primeiro
+TILE_ORDER_SCORE = [TILE_VALUE[i] * 2 + (13 if TILE_DOUBLE[i] else 0) for i in range(bitboard.TILE_COUNT)]
+
+class SearchStats:
+    """
+    Contadores e resumo de uma decisão da IA.
+
+    A busca só atualiza os contadores quando recebe um SearchStats; sem ele, não
+    há custo algum. Depois da busca, record() retorna um dicionário pronto para
+    ser gravado (por exemplo em um SearchTrace).
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.leaf_nodes = 0
+        self.pass_nodes = 0
+        self.expanded_nodes = 0      # nós cujas jogadas foram geradas
+        self.moves_generated = 0
+        self.tt_hits = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0  # cortes na primeira jogada examinada
+        self.cutoffs_by_depth = {}   # profundidade restante -> cortes
+        self.researches = 0          # buscas repetidas após falha da janela nula (PVS)
+        self.iterations = []         # uma entrada por iteração do aprofundamento
+        self.depth = 0
+        self.score = None
+        self.move = None
+        self.principal_variation = []
+        self.solved = False          # decisão tomada pelo solver exato de finais
+        self.book = False            # jogada tirada do livro de aberturas
+        self.cached = False          # jogada tirada do cache persistente de posições
+        self.seconds = 0.0
+
+    def branching_factor(self):
+        """Número médio de jogadas por nó expandido."""
+        if not self.expanded_nodes:
+            return 0.0
+        return self.moves_generated / self.expanded_nodes
+
+    def add_iteration(self, depth, seconds, score, move):
+        """Registra o resultado de uma iteração (ou da busca de profundidade fixa)."""
+        self.iterations.append({'depth': depth, 'seconds': seconds, 'nodes': self.nodes,
+                                'score': score, 'move': move})
+
+    def record(self):
+        """Retorna os contadores e o resumo da decisão como dicionário serializável."""
+        return {
+            'nodes': self.nodes,
+            'leaf_nodes': self.leaf_nodes,
+            'pass_nodes': self.pass_nodes,
+            'tt_hits': self.tt_hits,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'cutoffs_by_depth': {str(depth): count for depth, count in sorted(self.cutoffs_by_depth.items())},
+            'researches': self.researches,
+            'branching_factor': round(self.branching_factor(), 3),
+            'iterations': self.iterations,
+            'depth': self.depth,
+            'score': self.score,
+            'move': self.move,
+            'principal_variation': self.principal_variation,
+            'solved': self.solved,
+            'book': self.book,
+            'cached': self.cached,
+            'seconds': self.seconds,
+        }
+
+    def __repr__(self):
+        return f"SearchStats(nodes={self.nodes}, cutoffs={self.cutoffs}, depth={self.depth})"
+
+class SearchTrace:
+    """
+    Grava um registro JSON por decisão em um arquivo JSONL.
+
+    O arquivo é aberto em modo de acréscimo a cada registro e fechado em seguida,
+    de modo que nada fica pendente no fim da partida nem arquivos ficam abertos
+    entre as jogadas.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, record):
+        """Acrescenta um registro ao arquivo."""
+        import json
+        
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+class MoveOrdering:
+    """Jogadas assassinas (killer) por profundidade e histórico de cortes."""
+
+    def __init__(self):
+        self.killers = {}  # profundidade -> até duas jogadas que causaram corte
+        self.history = {}  # jogada -> soma de depth² dos cortes que causou
+
+    def record_cutoff(self, move, depth):
+        """Registra uma jogada que causou corte beta."""
+        killers = self.killers.setdefault(depth, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+def order_moves(moves, depth, hash_move=None, ordering=None):
+    """
+    Ordena as jogadas no lugar: primeiro a jogada da tabela de transposição, depois
+    peças de maior valor e duplas, desempatando por jogadas assassinas e histórico.
+
+    No dominó a ordem estática é a que mais poda; assassinas e histórico dependem
+    demais das extremidades para valerem mais que ela.
+    """
+    if ordering is None:
+        def move_score(move):
+            if move == hash_move:
+                return 1 << 40
+            return TILE_ORDER_SCORE[move[0]]
+    else:
+        killers = ordering.killers.get(depth, ())
+        history = ordering.history
+        
+        def move_score(move):
+            if move == hash_move:
+                return 1 << 40
+            score = (TILE_ORDER_SCORE[move[0]] << 20) + min(history.get(move, 0), (1 << 18) - 1)
+            if move in killers:
+                score += 1 << 18
+            return score
+    moves.sort(key=move_score, reverse=True)
+
+def negamax(ends, player_mask, opponent_mask, depth, alpha, beta, color, difficulty, table=None, key=None,
+            budget=None, ordering=None, stats=None, pvs=False, aggregates=None, rng=random):
+    """
+    Busca alfa-beta (forma negamax) sobre máscaras de bits.
+
+    player_mask é a mão de quem joga no nó e color vale 1 quando é o jogador raiz e
+    -1 quando é o oponente. O valor retornado é do ponto de vista de quem joga, e a
+    jogada é um par (índice da peça, lado). No modo fácil o jogador raiz
+    considera só metade das jogadas, sorteadas com rng, e não há poda nem tabela
+    de transposição. Com um SearchBudget, a busca é interrompida por
+    SearchTimeout quando o orçamento acaba.
 
-def minimax(board, ends, player_pieces, opponent_pieces, depth, alpha, beta, maximizing_player, difficulty):
-    """Algoritmo Minimax com poda alfa-beta e suporte a níveis de dificuldade."""
+    As jogadas são examinadas na ordem de order_moves (jogada da tabela, jogadas
+    assassinas e histórico de um MoveOrdering, depois peças altas e duplas). Com
+    pvs=True, as jogadas após a primeira são testadas com janela nula (PVS).
+
+    aggregates é um EvalAggregates com as duas mãos do nó: as jogadas o
+    atualizam e desfazem, e as folhas são avaliadas em O(1) a partir dele, com
+    os seus pesos (sem ele valem os pesos padrão da dificuldade). Se a
+    busca for interrompida por SearchTimeout ele fica inconsistente e deve ser
+    descartado.
+    """
+    if budget is not None:
+        budget.tick()
+    if stats is not None:
+        stats.nodes += 1
+    
     # Condições de parada
-    if depth == 0 or not player_pieces or not opponent_pieces:
-        return evaluate_state(player_pieces, opponent_pieces, difficulty), None
+    if depth == 0 or not player_mask or not opponent_mask:
+        if stats is not None:
+            stats.leaf_nodes += 1
+        if aggregates is not None:
+            return color * aggregates.evaluate(), None
+        if color == 1:
+            return evaluate_mask_state(player_mask, opponent_mask, difficulty), None
+        return -evaluate_mask_state(opponent_mask, player_mask, difficulty), None
     
-    valid_moves = get_valid_moves(player_pieces, ends)
+    easy = difficulty == DifficultyLevel.EASY
+    hash_move = None
+    if easy:
+        table = None
+    if table is not None:
+        if key is None:
+            if color == 1:
+                key = compute_mask_hash(ends, player_mask, opponent_mask, True)
+            else:
+                key = compute_mask_hash(ends, opponent_mask, player_mask, False)
+        entry = table.probe(key)
+        if entry is not None:
+            if stats is not None:
+                stats.tt_hits += 1
+            _, entry_depth, score, flag, hash_move, _ = entry
+            if entry_depth >= depth:
+                if flag == TranspositionTable.EXACT:
+                    return score, hash_move
+                if flag == TranspositionTable.LOWER and score >= beta:
+                    return score, hash_move
+                if flag == TranspositionTable.UPPER and score <= alpha:
+                    return score, hash_move
+        alpha_orig = alpha
+        zobrist_tiles = ZOBRIST_MASK_TILES[0 if color == 1 else 1]
+        ends_key = _ends_hash(ends)
+    
+    valid_moves = bitboard.get_valid_moves(player_mask, ends)
     
     if not valid_moves:
         # Passa a vez - troca os jogadores e continua
-        return minimax(board, ends, opponent_pieces, player_pieces, 
-                      depth - 1, alpha, beta, not maximizing_player, difficulty)[0], None
+        if stats is not None:
+            stats.pass_nodes += 1
+        child_key = key ^ ZOBRIST_SIDE if table is not None else None
+        score, _ = negamax(ends, opponent_mask, player_mask, depth - 1, -beta, -alpha, -color,
+                           difficulty, table, child_key, budget, ordering, stats, pvs, aggregates, rng)
+        return -score, None
     
-    if maximizing_player:
-        max_eval = float('-inf')
-        best_move = None
-        
+    if stats is not None:
+        stats.expanded_nodes += 1
+        stats.moves_generated += len(valid_moves)
+    
+    if easy:
         # Para dificuldade fácil, ignora algumas jogadas aleatoriamente para decisões subótimas
-        if difficulty == DifficultyLevel.EASY:
-            import random
-            valid_moves = random.sample(valid_moves, max(1, len(valid_moves) // 2))
+        if color == 1:
+            valid_moves = rng.sample(valid_moves, max(1, len(valid_moves) // 2))
+    elif len(valid_moves) > 1:
+        order_moves(valid_moves, depth, hash_move, ordering)
+    
+    best_score = float('-inf')
+    best_move = None
+    owner = 0 if color == 1 else 1
+    
+    for i, (idx, side) in enumerate(valid_moves):
+        new_mask, new_ends = bitboard.apply_move(player_mask, idx, side, ends)
+        if aggregates is not None:
+            aggregates.remove(owner, idx)
         
-        for piece, side in valid_moves:
-            new_board, new_ends = apply_move(board[:], piece, side, ends)
-            new_player_pieces = player_pieces[:]
-            new_player_pieces.remove(piece)
-            
-            eval_score, _ = minimax(new_board, new_ends, opponent_pieces, new_player_pieces, 
-                                  depth - 1, alpha, beta, False, difficulty)
-            
-            if eval_score > max_eval:
-                max_eval = eval_score
-                best_move = (piece, side)
-            
-            alpha = max(alpha, max_eval)
-            if beta <= alpha and difficulty != DifficultyLevel.EASY:  # Sem poda no modo fácil
-                break
-                
-        return max_eval, best_move
-    else:
-        min_eval = float('inf')
-        best_move = None
+        child_key = None
+        if table is not None:
+            child_key = key ^ zobrist_tiles[idx] ^ ends_key ^ _ends_hash(new_ends) ^ ZOBRIST_SIDE
+        if pvs and i > 0 and alpha != float('-inf') and not easy:
+            # Janela nula: só confirma que a jogada não supera alpha
+            score, _ = negamax(new_ends, opponent_mask, new_mask, depth - 1, -alpha - 1, -alpha, -color,
+                               difficulty, table, child_key, budget, ordering, stats, pvs, aggregates, rng)
+            score = -score
+            if alpha < score < beta:
+                if stats is not None:
+                    stats.researches += 1
+                score, _ = negamax(new_ends, opponent_mask, new_mask, depth - 1, -beta, -score, -color,
+                                   difficulty, table, child_key, budget, ordering, stats, pvs, aggregates, rng)
+                score = -score
+        else:
+            score, _ = negamax(new_ends, opponent_mask, new_mask, depth - 1, -beta, -alpha, -color,
+                               difficulty, table, child_key, budget, ordering, stats, pvs, aggregates, rng)
+            score = -score
+        if aggregates is not None:
+            aggregates.restore(owner, idx)
         
-        for piece, side in valid_moves:
-            new_board, new_ends = apply_move(board[:], piece, side, ends)
-            new_player_pieces = player_pieces[:]
-            new_player_pieces.remove(piece)
-            
-            eval_score, _ = minimax(new_board, new_ends, opponent_pieces, new_player_pieces, 
-                                  depth - 1, alpha, beta, True, difficulty)
-            
-            if eval_score < min_eval:
-                min_eval = eval_score
-                best_move = (piece, side)
-            
-            beta = min(beta, min_eval)
-            if beta <= alpha and difficulty != DifficultyLevel.EASY:  # Sem poda no modo fácil
-                break
-                
-        return min_eval, best_move
+        if score > best_score:
+            best_score = score
+            best_move = (idx, side)
+        
+        alpha = max(alpha, best_score)
+        if beta <= alpha and not easy:  # Sem poda no modo fácil
+            if stats is not None:
+                stats.cutoffs += 1
+                stats.cutoffs_by_depth[depth] = stats.cutoffs_by_depth.get(depth, 0) + 1
+                if i == 0:
+                    stats.first_move_cutoffs += 1
+            if ordering is not None:
+                ordering.record_cutoff(best_move, depth)
+            break
+    
+    if table is not None:
+        _store_result(table, key, depth, best_score, best_move, alpha_orig, beta)
+    
+    return best_score, best_move
+
+def compute_mask_hash(ends, root_mask, other_mask, root_to_move=True):
+    """
+    Calcula o hash de Zobrist do estado (extremidades, mão do jogador raiz, mão
+    do oponente, jogador da vez), com as mãos representadas como máscaras de bits.
+    """
+    h = _ends_hash(ends)
+    for idx in bitboard.iter_tiles(root_mask):
+        h ^= ZOBRIST_MASK_TILES[0][idx]
+    for idx in bitboard.iter_tiles(other_mask):
+        h ^= ZOBRIST_MASK_TILES[1][idx]
+    if not root_to_move:
+        h ^= ZOBRIST_SIDE
+    return h
 
 def get_search_depth(difficulty):
     """Retorna a profundidade da busca com base no nível de dificuldade."""
@@ -152,12 +587,320 @@ def get_search_depth(difficulty):
         return 2
     elif difficulty == DifficultyLevel.MEDIUM:
         return 3
-    else:  # HARD
-        return 4
-
-def find_best_move(board, ends, player_pieces, opponent_pieces, difficulty=DifficultyLevel.MEDIUM):
-    """Encontra a melhor jogada usando o minimax com poda alfa-beta."""
-    depth = get_search_depth(difficulty)
-    _, best_move = minimax(board, ends, player_pieces, opponent_pieces, 
-                          depth, float('-inf'), float('inf'), True, difficulty)
-    return best_move
+    else:  # HARD (a tabela de transposição mantém o custo da profundidade extra baixo)
+        return 6
+
+def search_root(ends, player_mask, opponent_mask, depth, difficulty, table=None, budget=None, first_move=None,
+                ordering=None, stats=None, pvs=False, weights=None, rng=random):
+    """
+    Busca a raiz até a profundidade dada, examinando first_move antes das demais.
+
+    Retorna (valor, jogada), com a jogada no formato (índice da peça, lado), ou
+    (valor, None) se o jogador raiz não tiver jogadas. As folhas são avaliadas
+    por um EvalAggregates criado para a busca, com weights (um EvalWeights) ou
+    os pesos padrão da dificuldade.
+    """
+    aggregates = EvalAggregates(player_mask, opponent_mask, difficulty, weights)
+    valid_moves = bitboard.get_valid_moves(player_mask, ends)
+    if not valid_moves:
+        return negamax(ends, player_mask, opponent_mask, depth, float('-inf'), float('inf'), 1,
+                       difficulty, table, None, budget, ordering, stats, pvs, aggregates, rng)
+    
+    if stats is not None:
+        stats.nodes += 1
+        stats.expanded_nodes += 1
+        stats.moves_generated += len(valid_moves)
+    easy = difficulty == DifficultyLevel.EASY
+    key = None
+    if easy:
+        table = None
+        valid_moves = rng.sample(valid_moves, max(1, len(valid_moves) // 2))
+    else:
+        hash_move = first_move
+        if table is not None:
+            key = compute_mask_hash(ends, player_mask, opponent_mask, True)
+            entry = table.probe(key)
+            if hash_move is None and entry is not None:
+                hash_move = entry[4]
+        order_moves(valid_moves, depth, hash_move, ordering)
+    
+    alpha = float('-inf')
+    best_score = float('-inf')
+    best_move = None
+    
+    for i, (idx, side) in enumerate(valid_moves):
+        new_mask, new_ends = bitboard.apply_move(player_mask, idx, side, ends)
+        child_key = None
+        if table is not None:
+            child_key = key ^ ZOBRIST_MASK_TILES[0][idx] ^ _ends_hash(ends) ^ _ends_hash(new_ends) ^ ZOBRIST_SIDE
+        aggregates.remove(0, idx)
+        if easy:
+            score, _ = negamax(new_ends, opponent_mask, new_mask, depth - 1, float('-inf'), float('inf'), -1,
+                               difficulty, None, None, budget, ordering, stats, pvs, aggregates, rng)
+            score = -score
+        elif pvs and i > 0:
+            score, _ = negamax(new_ends, opponent_mask, new_mask, depth - 1, -alpha - 1, -alpha, -1,
+                               difficulty, table, child_key, budget, ordering, stats, pvs, aggregates, rng)
+            score = -score
+            if score > alpha:
+                if stats is not None:
+                    stats.researches += 1
+                score, _ = negamax(new_ends, opponent_mask, new_mask, depth - 1, float('-inf'), -score, -1,
+                                   difficulty, table, child_key, budget, ordering, stats, pvs, aggregates, rng)
+                score = -score
+        else:
+            score, _ = negamax(new_ends, opponent_mask, new_mask, depth - 1, float('-inf'), -alpha, -1,
+                               difficulty, table, child_key, budget, ordering, stats, pvs, aggregates, rng)
+            score = -score
+        aggregates.restore(0, idx)
+        if score > best_score:
+            best_score = score
+            best_move = (idx, side)
+            alpha = max(alpha, best_score)
+    
+    if table is not None:
+        table.store(key, depth, best_score, TranspositionTable.EXACT, best_move)
+    
+    return best_score, best_move
+
+def score_root_moves(ends, player_mask, opponent_mask, depth, difficulty, table=None, budget=None,
+                     ordering=None, moves=None, stats=None, weights=None, rng=random):
+    """
+    Retorna o valor exato de cada jogada da raiz, como lista de ((índice, lado), valor).
+
+    Diferente de search_root, cada jogada é buscada com janela completa, para que
+    os valores possam ser somados entre determinizações. moves restringe as
+    jogadas examinadas, e weights é como em search_root.
+    """
+    if moves is None:
+        moves = bitboard.get_valid_moves(player_mask, ends)
+    if difficulty == DifficultyLevel.EASY:
+        table = None
+    key = compute_mask_hash(ends, player_mask, opponent_mask, True) if table is not None else None
+    
+    aggregates = EvalAggregates(player_mask, opponent_mask, difficulty, weights)
+    scores = []
+    for idx, side in moves:
+        new_mask, new_ends = bitboard.apply_move(player_mask, idx, side, ends)
+        child_key = None
+        if table is not None:
+            child_key = key ^ ZOBRIST_MASK_TILES[0][idx] ^ _ends_hash(ends) ^ _ends_hash(new_ends) ^ ZOBRIST_SIDE
+        aggregates.remove(0, idx)
+        score, _ = negamax(new_ends, opponent_mask, new_mask, depth - 1, float('-inf'), float('inf'), -1,
+                           difficulty, table, child_key, budget, ordering, stats, aggregates=aggregates, rng=rng)
+        aggregates.restore(0, idx)
+        scores.append(((idx, side), -score))
+    return scores
+
+def iterative_deepening(ends, player_mask, opponent_mask, difficulty, time_limit=None, node_limit=None,
+                        max_depth=None, table=None, ordering=None, stats=None, pvs=False, engine=None,
+                        weights=None, rng=random):
+    """
+    Aprofundamento iterativo sob um orçamento de tempo e/ou de nós.
+
+    Busca com profundidade 1, 2, 3, ... até max_depth (por padrão, o suficiente para
+    esgotar as duas mãos), começando cada iteração pela melhor jogada da anterior.
+    Quando o orçamento acaba, retorna o resultado da última iteração completa.
+    Com um inplace.InPlaceSearch em engine, cada iteração é feita por ele (e
+    table, ordering, stats, pvs e weights são os do engine).
+    Retorna (valor, jogada, profundidade concluída).
+    """
+    if max_depth is None:
+        max_depth = bin(player_mask).count('1') + bin(opponent_mask).count('1') + 2
+    
+    budget = SearchBudget(time_limit, node_limit)
+    best_score, best_move, completed_depth = None, None, 0
+    
+    for depth in range(1, max_depth + 1):
+        start = time.perf_counter()
+        try:
+            if engine is not None:
+                score, move = engine.search(ends, player_mask, opponent_mask, depth, budget, best_move)
+            else:
+                score, move = search_root(ends, player_mask, opponent_mask, depth, difficulty,
+                                          table, budget, best_move, ordering, stats, pvs, weights, rng)
+        except SearchTimeout:
+            break
+        best_score, best_move, completed_depth = score, move, depth
+        if stats is not None:
+            stats.add_iteration(depth, time.perf_counter() - start, score, move)
+    
+    if best_move is None:
+        # Nem a primeira iteração terminou: joga a primeira jogada válida
+        valid_moves = bitboard.get_valid_moves(player_mask, ends)
+        if valid_moves:
+            best_move = valid_moves[0]
+    
+    return best_score, best_move, completed_depth
+
+def extract_principal_variation(table, ends, player_mask, opponent_mask, depth, first_move):
+    """
+    Reconstrói a variação principal seguindo as jogadas guardadas na tabela.
+
+    Retorna uma lista de jogadas (índice, lado), com None para os passes.
+    """
+    masks = [player_mask, opponent_mask]  # [jogador raiz, oponente]
+    mover = 0
+    key = compute_mask_hash(ends, player_mask, opponent_mask, True)
+    move = first_move
+    line = []
+    
+    while len(line) < depth and masks[0] and masks[1]:
+        if move is None:
+            if bitboard.get_valid_moves(masks[mover], ends):
+                break
+            line.append(None)
+            key ^= ZOBRIST_SIDE
+        else:
+            if move not in bitboard.get_valid_moves(masks[mover], ends):
+                break
+            idx, side = move
+            line.append(move)
+            masks[mover], new_ends = bitboard.apply_move(masks[mover], idx, side, ends)
+            key ^= ZOBRIST_MASK_TILES[mover][idx] ^ _ends_hash(ends) ^ _ends_hash(new_ends) ^ ZOBRIST_SIDE
+            ends = new_ends
+        mover = 1 - mover
+        entry = table.probe(key)
+        move = entry[4] if entry is not None else None
+    
+    return line
+
+def find_best_move(board, ends, player_pieces, opponent_pieces, difficulty=DifficultyLevel.MEDIUM, table=None,
+                   time_limit=None, node_limit=None, pvs=False, stats=None, pool=None,
+                   stock_size=None, solver=None, root_first=True, endgame_threshold=None,
+                   in_place=False, cache=None, weights=None, rng=random):
+    """
+    Encontra a melhor jogada usando a busca alfa-beta.
+
+    A busca roda sobre máscaras de bits (ver negamax); o tabuleiro não é usado, pois
+    só as extremidades importam. Uma TranspositionTable pode ser passada para
+    reaproveitar posições já buscadas em jogadas anteriores da mesma partida.
+    
+    Se time_limit (segundos) ou node_limit forem dados, a profundidade fixa de
+    get_search_depth dá lugar ao aprofundamento iterativo dentro desse orçamento.
+    pvs=True ativa a busca de variação principal, e um SearchStats recebe os
+    contadores da busca, o tempo de cada iteração e a variação principal. Com um
+    parallel.SearchPool, as jogadas da raiz da busca de profundidade fixa são
+    divididas entre processos (exceto no modo fácil); os contadores dos processos
+    não entram no SearchStats.
+    
+    in_place=True faz a busca com inplace.InPlaceSearch, que aplica e desfaz as
+    jogadas em um único estado em vez de criar um por nó. Ela usa só a ordem
+    estática de jogadas (sem MoveOrdering nem pvs), de modo que em
+    jogadas de mesmo valor a escolha pode diferir. O modo fácil e o pool ignoram
+    in_place.
+    
+    Se stock_size for 0 e as duas mãos somarem até endgame_threshold peças (por
+    padrão endgame.ENDGAME_TILE_THRESHOLD), o final é resolvido com jogo perfeito
+    por um endgame.EndgameSolver (reaproveitável entre jogadas via solver);
+    root_first indica se o jogador senta primeiro, o que decide empates no jogo
+    travado. Sem jogada vencedora, a busca heurística decide. O modo fácil nunca
+    usa o solver.
+    
+    Com um poscache.PositionCache, o resultado de cada busca é guardado em disco
+    e, nas buscas de profundidade fixa, uma posição já buscada com profundidade
+    suficiente é respondida pelo cache (exceto no modo fácil). O cache só é
+    consultado depois do solver de finais.
+    
+    weights (um EvalWeights) substitui os pesos padrão da avaliação, e rng (um
+    random.Random) faz as escolhas aleatórias do modo fácil.
+    """
+    start = time.perf_counter()
+    player_mask = bitboard.pieces_to_mask(player_pieces)
+    opponent_mask = bitboard.pieces_to_mask(opponent_pieces)
+    best_move = None
+
+    valid_moves = bitboard.get_valid_moves(player_mask, ends)
+    if len(valid_moves) == 1:
+        # Jogada única: não há o que buscar
+        if stats is not None:
+            stats.seconds = time.perf_counter() - start
+            stats.move = valid_moves[0]
+        return _piece_for_move(player_pieces, valid_moves[0])
+
+    if difficulty != DifficultyLevel.EASY and stock_size is not None:
+        import endgame
+        
+        if endgame_threshold is None:
+            endgame_threshold = endgame.ENDGAME_TILE_THRESHOLD
+        if endgame.use_endgame_solver(player_mask, opponent_mask, stock_size, endgame_threshold):
+            if solver is None:
+                solver = endgame.EndgameSolver()
+            order_moves(valid_moves, 0)
+            winning = solver.winning_moves(ends, player_mask, opponent_mask, root_first, valid_moves)
+            if winning:
+                best_move = winning[0]
+                if stats is not None:
+                    stats.seconds = time.perf_counter() - start
+                    stats.move = best_move
+                    stats.solved = True
+                return _piece_for_move(player_pieces, best_move)
+    
+    # O cache vem depois do solver: uma jogada heurística guardada não pode
+    # encobrir uma vitória provada. O monte e quem começou entram na chave, pois
+    # mudam o resultado dos finais e dos jogos travados.
+    cache_key = None
+    if cache is not None and difficulty != DifficultyLevel.EASY:
+        from poscache import mix_key
+        
+        cache_key = mix_key(compute_mask_hash(ends, player_mask, opponent_mask, True), difficulty,
+                            0 if stock_size is None else stock_size + 1, int(root_first))
+        if weights is not None:
+            cache_key = mix_key(cache_key, weights_key(weights))
+        if time_limit is None and node_limit is None:
+            entry = cache.get(cache_key, get_search_depth(difficulty))
+            if entry is not None and entry[2] is not None:
+                if stats is not None:
+                    stats.seconds = time.perf_counter() - start
+                    stats.depth, stats.score, stats.move = entry
+                    stats.cached = True
+                return _piece_for_move(player_pieces, entry[2])
+    
+    ordering = MoveOrdering()
+    engine = None
+    if in_place and difficulty != DifficultyLevel.EASY:
+        from inplace import InPlaceSearch
+        
+        engine = InPlaceSearch(difficulty, table, stats, weights)
+    if table is not None:
+        table.new_search()
+    if time_limit is not None or node_limit is not None:
+        score, best_move, depth = iterative_deepening(ends, player_mask, opponent_mask, difficulty,
+                                                      time_limit, node_limit, table=table, ordering=ordering,
+                                                      stats=stats, pvs=pvs, engine=engine,
+                                                      weights=weights, rng=rng)
+    elif pool is not None and difficulty != DifficultyLevel.EASY:
+        depth = get_search_depth(difficulty)
+        score, best_move = pool.search_root(ends, player_mask, opponent_mask, depth, difficulty, weights)
+    else:
+        depth = get_search_depth(difficulty)
+        if engine is not None:
+            score, best_move = engine.search(ends, player_mask, opponent_mask, depth)
+        else:
+            score, best_move = search_root(ends, player_mask, opponent_mask, depth, difficulty, table,
+                                           ordering=ordering, stats=stats, pvs=pvs,
+                                           weights=weights, rng=rng)
+        if stats is not None:
+            stats.add_iteration(depth, time.perf_counter() - start, score, best_move)
+    
+    if cache_key is not None and best_move is not None and depth:
+        cache.put(cache_key, depth, score, best_move)
+    
+    if stats is not None:
+        stats.seconds = time.perf_counter() - start
+        stats.depth = depth
+        stats.score = score
+        stats.move = best_move
+        if table is not None and best_move is not None:
+            stats.principal_variation = extract_principal_variation(table, ends, player_mask, opponent_mask,
+                                                                    depth, best_move)
+    if best_move is None:
+        return None
+    return _piece_for_move(player_pieces, best_move)
+
+def _piece_for_move(player_pieces, move):
+    """Converte (índice, lado) em (peça, lado), com a peça original da mão."""
+    idx, side = move
+    for piece in player_pieces:
+        if piece.index == idx:
+            return piece, side
@@ -0,0 +1,361 @@
+import argparse
+import functools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import ai
+import bitboard
+import inplace
+from ai import DifficultyLevel
+from utils import hand_size
+
+# Benchmarks dos caminhos quentes da IA sobre um conjunto fixo de posições geradas
+# com sementes. Os resultados são gravados em JSON e podem ser comparados com uma
+# linha de base para detectar regressões.
+
+CORPUS_SEED = 2024
+POSITIONS_PER_PHASE = 12
+PHASES = ('opening', 'midgame', 'endgame', 'blocked')
+SET_SIZES = (6, 9, 12)  # duplo-6 (28 peças), duplo-9 (55) e duplo-12 (91)
+
+def _random_playout(rng, max_dots=6, pieces_per_player=7):
+    """
+    Gera a sequência de posições de uma partida com jogadas aleatórias.
+
+    Cada posição é (ends, mão de quem joga, mão do outro, peças no monte),
+    sempre antes da decisão de quem joga.
+    """
+    tiles = list(range(bitboard.tile_index(max_dots, max_dots) + 1))
+    rng.shuffle(tiles)
+    hands = [0, 0]
+    for player in range(2):
+        for idx in tiles[player * pieces_per_player:(player + 1) * pieces_per_player]:
+            hands[player] |= 1 << idx
+    stock = tiles[2 * pieces_per_player:]
+
+    # A maior peça (pelo valor) da primeira mão abre o jogo
+    first = max(bitboard.iter_tiles(hands[0]), key=lambda idx: bitboard.TILE_VALUE[idx])
+    hands[0], ends = bitboard.apply_move(hands[0], first, 'left', (None, None))
+    player, passes = 1, 0
+    positions = []
+
+    while hands[0] and hands[1] and passes < 2:
+        moves = bitboard.get_valid_moves(hands[player], ends)
+        while not moves and stock:
+            hands[player] |= 1 << stock.pop()
+            moves = bitboard.get_valid_moves(hands[player], ends)
+        positions.append((ends, hands[player], hands[1 - player], len(stock)))
+        if moves:
+            idx, side = rng.choice(moves)
+            hands[player], ends = bitboard.apply_move(hands[player], idx, side, ends)
+            passes = 0
+        else:
+            passes += 1
+        player = 1 - player
+    return positions
+
+def _phase(position):
+    """Classifica uma posição em abertura, meio-jogo, final ou travada."""
+    ends, player_mask, opponent_mask, stock = position
+    if not bitboard.get_valid_moves(player_mask, ends):
+        return 'blocked'
+    tiles = bin(player_mask).count('1') + bin(opponent_mask).count('1')
+    if tiles >= 12:
+        return 'opening'
+    if stock == 0 and tiles <= 8:
+        return 'endgame'
+    return 'midgame'
+
+def build_corpus(seed=CORPUS_SEED, per_phase=POSITIONS_PER_PHASE, max_dots=6):
+    """
+    Gera o conjunto fixo de posições do benchmark: per_phase posições por fase.
+
+    Retorna um dicionário fase -> lista de (ends, mão de quem joga, mão do outro, monte).
+    """
+    rng = random.Random(seed)
+    corpus = {phase: [] for phase in PHASES}
+    pieces_per_player = hand_size(max_dots)
+    while any(len(positions) < per_phase for positions in corpus.values()):
+        for position in _random_playout(rng, max_dots, pieces_per_player):
+            positions = corpus[_phase(position)]
+            if len(positions) < per_phase:
+                positions.append(position)
+    return corpus
+
+def _best_time(func, repeat):
+    """Menor tempo (segundos) de repeat execuções de func."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_primitives(corpus, repeat=5):
+    """Mede operações por segundo de geração de jogadas, aplicação e avaliação."""
+    positions = [position for phase in PHASES for position in corpus[phase]]
+    moves = [(position, move) for position in positions
+             for move in bitboard.get_valid_moves(position[1], position[0])]
+    loops = 1000
+
+    def valid_moves():
+        for _ in range(loops):
+            for ends, player_mask, _, _ in positions:
+                bitboard.get_valid_moves(player_mask, ends)
+
+    def apply_moves():
+        for _ in range(loops):
+            for (ends, player_mask, _, _), (idx, side) in moves:
+                bitboard.apply_move(player_mask, idx, side, ends)
+
+    def evaluate(difficulty):
+        def run():
+            for _ in range(loops):
+                for _, player_mask, opponent_mask, _ in positions:
+                    ai.evaluate_mask_state(player_mask, opponent_mask, difficulty)
+        return run
+
+    def evaluate_incremental(difficulty):
+        # Jogada, avaliação e desfazer sobre ai.EvalAggregates, como nas folhas da busca
+        aggregates = [(ai.EvalAggregates(player_mask, opponent_mask, difficulty), idx)
+                      for (_, player_mask, opponent_mask, _), (idx, _) in moves]
+
+        def run():
+            for _ in range(loops):
+                for state, idx in aggregates:
+                    state.remove(0, idx)
+                    state.evaluate()
+                    state.restore(0, idx)
+        return run
+
+    results = {
+        'get_valid_moves.ops_per_sec': loops * len(positions) / _best_time(valid_moves, repeat),
+        'apply_move.ops_per_sec': loops * len(moves) / _best_time(apply_moves, repeat),
+    }
+    for name, difficulty in (('easy', DifficultyLevel.EASY), ('medium', DifficultyLevel.MEDIUM),
+                             ('hard', DifficultyLevel.HARD)):
+        results[f'evaluate.{name}.ops_per_sec'] = \
+            loops * len(positions) / _best_time(evaluate(difficulty), repeat)
+        results[f'evaluate_incremental.{name}.ops_per_sec'] = \
+            loops * len(moves) / _best_time(evaluate_incremental(difficulty), repeat)
+    return results
+
+def _root_search(difficulty, depth, table, stats=None, in_place=False, rng=random):
+    """
+    Retorna uma função (ends, mão, mão do outro) que busca a raiz com a configuração
+    dada. rng faz as escolhas aleatórias do modo fácil.
+    """
+    if in_place:
+        engine = inplace.InPlaceSearch(difficulty, table, stats)
+        return lambda ends, player_mask, opponent_mask: engine.search(ends, player_mask, opponent_mask, depth)
+    return lambda ends, player_mask, opponent_mask: ai.search_root(
+        ends, player_mask, opponent_mask, depth, difficulty, table, ordering=ai.MoveOrdering(), stats=stats,
+        rng=rng)
+
+def bench_search(corpus, repeat=3, rounds=20):
+    """
+    Mede a busca em cada dificuldade: nós por segundo, tempo médio por jogada e
+    pico de memória alocada, por fase e no total. Cada medida percorre as posições
+    rounds vezes, para que buscas curtas não fiquem abaixo da resolução do relógio.
+    A busca difícil também é medida com a busca no lugar de inplace.py
+    (search.hard_inplace).
+    """
+    results = {}
+    for name, difficulty, in_place in (
+            ('easy', DifficultyLevel.EASY, False),
+            ('medium', DifficultyLevel.MEDIUM, False),
+            ('hard', DifficultyLevel.HARD, False),
+            ('hard_inplace', DifficultyLevel.HARD, True)):
+        depth = ai.get_search_depth(difficulty)
+        total_nodes, total_time, total_moves = 0, 0.0, 0
+        for phase in PHASES:
+            positions = corpus[phase]
+            stats = ai.SearchStats()
+
+            def run():
+                rng = random.Random(CORPUS_SEED)  # escolhas aleatórias do modo fácil
+                stats.__init__()
+                for _ in range(rounds):
+                    # Como na partida, uma tabela é reaproveitada entre as jogadas
+                    table = ai.TranspositionTable()
+                    search = _root_search(difficulty, depth, table, stats, in_place, rng)
+                    for ends, player_mask, opponent_mask, _ in positions:
+                        table.new_search()
+                        search(ends, player_mask, opponent_mask)
+
+            elapsed = _best_time(run, repeat)
+            moves = rounds * len(positions)
+            results[f'search.{name}.{phase}.ms_per_move'] = elapsed * 1000 / moves
+            results[f'search.{name}.{phase}.nodes'] = stats.nodes // rounds
+            total_nodes += stats.nodes
+            total_time += elapsed
+            total_moves += moves
+
+        results[f'search.{name}.nodes_per_sec'] = total_nodes / total_time
+        results[f'search.{name}.ms_per_move'] = total_time * 1000 / total_moves
+
+        tracemalloc.start()
+        table = ai.TranspositionTable()
+        search = _root_search(difficulty, depth, table, in_place=in_place, rng=random.Random(CORPUS_SEED))
+        for phase in PHASES:
+            for ends, player_mask, opponent_mask, _ in corpus[phase]:
+                table.new_search()
+                search(ends, player_mask, opponent_mask)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f'search.{name}.peak_kib'] = peak / 1024
+    return results
+
+def _timed_factory(factory, latencies):
+    """Fábrica de jogadores que guarda em latencies o tempo (segundos) de cada make_move."""
+    def create(name, pieces, **options):
+        player = factory(name, pieces, **options)
+        make_move = player.make_move
+
+        def timed_move(game):
+            start = time.perf_counter()
+            move = make_move(game)
+            latencies.append(time.perf_counter() - start)
+            return move
+        player.make_move = timed_move
+        return player
+    return create
+
+def bench_set_sizes(sizes=SET_SIZES, repeat=3, rounds=5, games=10):
+    """
+    Mede como a IA escala com o tamanho do conjunto de peças. Para cada conjunto:
+    geração de jogadas por segundo, tempo por jogada e nós da busca difícil (de
+    inplace.py) sobre um corpus do próprio conjunto, e a latência por jogada
+    (p50, p99) da IA difícil sem informação perfeita em games partidas contra o
+    jogador guloso.
+    """
+    from player import AIPlayer, GreedyPlayer
+    from simulate import play_game
+
+    results = {}
+    for max_dots in sizes:
+        prefix = f'sets.double{max_dots}'
+        corpus = build_corpus(max_dots=max_dots)
+        positions = [position for phase in PHASES for position in corpus[phase]]
+        loops = 1000
+
+        def valid_moves():
+            for _ in range(loops):
+                for ends, player_mask, _, _ in positions:
+                    bitboard.get_valid_moves(player_mask, ends)
+
+        results[f'{prefix}.get_valid_moves.ops_per_sec'] = loops * len(positions) / _best_time(valid_moves, repeat)
+
+        weights = ai.weights_for_set(ai.DEFAULT_WEIGHTS[DifficultyLevel.HARD], max_dots)
+        depth = ai.get_search_depth(DifficultyLevel.HARD)
+        stats = ai.SearchStats()
+
+        def run():
+            stats.__init__()
+            for _ in range(rounds):
+                engine = inplace.InPlaceSearch(DifficultyLevel.HARD, ai.TranspositionTable(), stats, weights)
+                for ends, player_mask, opponent_mask, _ in positions:
+                    engine.table.new_search()
+                    engine.search(ends, player_mask, opponent_mask, depth)
+
+        elapsed = _best_time(run, repeat)
+        results[f'{prefix}.search.hard.ms_per_move'] = elapsed * 1000 / (rounds * len(positions))
+        results[f'{prefix}.search.hard.nodes'] = stats.nodes // rounds
+
+        latencies = []
+        factory = _timed_factory(functools.partial(AIPlayer, difficulty=DifficultyLevel.HARD), latencies)
+        for seed in range(games):
+            play_game(CORPUS_SEED + seed, factory, GreedyPlayer, max_dots=max_dots,
+                      pieces_per_player=hand_size(max_dots), swap_seats=seed % 2 == 1)
+        latencies.sort()
+        for name, q in (('p50', 0.50), ('p99', 0.99)):
+            value = latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+            results[f'{prefix}.game.hard.{name}_ms'] = value * 1000
+    return results
+
+# Direção de melhora de cada métrica, pelo sufixo do nome
+_HIGHER_IS_BETTER = ('.ops_per_sec', '.nodes_per_sec')
+
+def _higher_is_better(metric):
+    return metric.endswith(_HIGHER_IS_BETTER)
+
+def run_benchmarks(repeat=3, sets=False):
+    """
+    Executa todos os benchmarks e retorna o registro de resultados. Com
+    sets=True, inclui bench_set_sizes.
+    """
+    corpus = build_corpus()
+    metrics = {}
+    metrics.update(bench_primitives(corpus, repeat))
+    metrics.update(bench_search(corpus, repeat))
+    if sets:
+        metrics.update(bench_set_sizes(repeat=repeat))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'corpus_seed': CORPUS_SEED,
+        },
+        'metrics': metrics,
+    }
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Compara dois registros de resultados.
+
+    Retorna a lista de (métrica, base, atual, variação relativa, regrediu?).
+    Uma métrica regride quando piora mais que threshold (10% por padrão).
+    Contagens de nós não são tempo: qualquer variação nelas indica que a busca
+    mudou, e é relatada como regressão apenas quando aumentam.
+    """
+    rows = []
+    for metric, base in sorted(baseline['metrics'].items()):
+        if metric not in current['metrics'] or not base:
+            continue
+        value = current['metrics'][metric]
+        change = (value - base) / base
+        if _higher_is_better(metric):
+            regressed = change < -threshold
+        elif metric.endswith('.nodes'):
+            regressed = value > base
+        else:
+            regressed = change > threshold
+        rows.append((metric, base, value, change, regressed))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos quentes da IA.")
+    parser.add_argument('-o', '--output', help="grava os resultados neste arquivo JSON")
+    parser.add_argument('--compare', metavar='BASELINE', help="compara com um arquivo de resultados anterior")
+    parser.add_argument('--threshold', type=float, default=0.10, help="piora relativa tolerada (padrão 0.10)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sets', action='store_true', help="mede também a escala com duplo-9 e duplo-12")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, args.sets)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if not args.compare:
+        for metric, value in sorted(results['metrics'].items()):
+            print(f"{metric:45s} {value:14.2f}")
+        return 0
+
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    regressions = 0
+    for metric, base, value, change, regressed in compare(results, baseline, args.threshold):
+        flag = 'REGRESSÃO' if regressed else ''
+        print(f"{metric:45s} {base:14.2f} {value:14.2f} {change:+8.1%} {flag}")
+        regressions += regressed
+    print(f"\n{regressions} regressão(ões) acima de {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
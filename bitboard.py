@@ -0,0 +1,108 @@
+from piece import DominoPiece
+
+# Representação compacta usada pela busca: cada peça do conjunto é um bit de um
+# inteiro e uma mão é a soma (OU) dos bits das suas peças. O tabuleiro em si não é
+# guardado, pois para a busca só as extremidades importam.
+
+MAX_DOTS = 12  # maior conjunto suportado (duplo-12)
+
+def tile_index(left, right):
+    """
+    Retorna o índice canônico da peça.
+
+    A numeração é triangular ([0|0]=0, [0|1]=1, [1|1]=2, [0|2]=3, ...), de modo que o
+    índice de uma peça não depende do tamanho do conjunto.
+    """
+    if left > right:
+        left, right = right, left
+    return right * (right + 1) // 2 + left
+
+TILE_COUNT = tile_index(MAX_DOTS, MAX_DOTS) + 1
+ALL_TILES = (1 << TILE_COUNT) - 1  # máscara com todas as peças do maior conjunto
+
+TILE_LOW = [0] * TILE_COUNT     # menor número de cada peça
+TILE_HIGH = [0] * TILE_COUNT    # maior número de cada peça
+for _high in range(MAX_DOTS + 1):
+    for _low in range(_high + 1):
+        TILE_LOW[tile_index(_low, _high)] = _low
+        TILE_HIGH[tile_index(_low, _high)] = _high
+TILE_VALUE = [TILE_LOW[i] + TILE_HIGH[i] for i in range(TILE_COUNT)]
+TILE_DOUBLE = [TILE_LOW[i] == TILE_HIGH[i] for i in range(TILE_COUNT)]
+
+# Para cada número, a máscara das peças que o contêm: as peças de uma mão que
+# encaixam em uma extremidade são a interseção da mão com essa máscara
+PIP_MASKS = [0] * (MAX_DOTS + 1)
+for _idx in range(TILE_COUNT):
+    PIP_MASKS[TILE_LOW[_idx]] |= 1 << _idx
+    PIP_MASKS[TILE_HIGH[_idx]] |= 1 << _idx
+
+def pieces_to_mask(pieces):
+    """Converte uma lista de peças em uma máscara de bits."""
+    mask = 0
+    for piece in pieces:
+        mask |= piece.bit
+    return mask
+
+def iter_tiles(mask):
+    """Itera sobre os índices das peças presentes na máscara, do menor para o maior."""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+def mask_to_pieces(mask):
+    """Converte uma máscara de bits em uma lista de peças (orientação canônica)."""
+    return [DominoPiece(TILE_LOW[i], TILE_HIGH[i]) for i in iter_tiles(mask)]
+
+def playable_masks(mask, ends):
+    """
+    Retorna (peças jogáveis na esquerda, peças jogáveis na direita) como máscaras.
+
+    Com o tabuleiro vazio todas as peças são jogáveis, só pela esquerda. Quando as
+    duas extremidades são iguais, as jogadas pela direita seriam repetidas e não
+    são geradas.
+    """
+    left_end, right_end = ends
+    if left_end is None:
+        return mask, 0
+    left_mask = mask & PIP_MASKS[left_end]
+    if right_end == left_end:
+        return left_mask, 0
+    return left_mask, mask & PIP_MASKS[right_end]
+
+def has_valid_move(mask, ends):
+    """Indica se alguma peça da mão encaixa em alguma extremidade."""
+    left_end, right_end = ends
+    if left_end is None:
+        return mask != 0
+    return mask & (PIP_MASKS[left_end] | PIP_MASKS[right_end]) != 0
+
+def get_valid_moves(mask, ends):
+    """Retorna as jogadas válidas (índice da peça, lado) para a mão e extremidades fornecidas."""
+    left_mask, right_mask = playable_masks(mask, ends)
+    valid_moves = []
+
+    while left_mask:
+        low_bit = left_mask & -left_mask
+        left_mask ^= low_bit
+        valid_moves.append((low_bit.bit_length() - 1, 'left'))
+    while right_mask:
+        low_bit = right_mask & -right_mask
+        right_mask ^= low_bit
+        valid_moves.append((low_bit.bit_length() - 1, 'right'))
+
+    return valid_moves
+
+def apply_move(mask, idx, side, ends):
+    """Remove a peça da mão e retorna a nova máscara e as novas extremidades."""
+    low = TILE_LOW[idx]
+    high = TILE_HIGH[idx]
+
+    if ends[0] is None:  # Primeira peça
+        new_ends = (low, high)
+    elif side == 'left':
+        new_ends = (high if low == ends[0] else low, ends[1])
+    else:  # right
+        new_ends = (ends[0], high if low == ends[1] else low)
+
+    return mask & ~(1 << idx), new_ends
@@ -0,0 +1,251 @@
+import argparse
+import functools
+import json
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+import bitboard
+from ai import DifficultyLevel, SearchStats, compute_mask_hash
+from game import DominoGame
+from player import Player
+from utils import generate_domino_set, shuffle_and_distribute
+
+# Livro de aberturas: as primeiras decisões de uma partida, calculadas offline
+# por busca profunda em partidas de autojogo, e consultadas durante o jogo sem
+# nenhuma busca.
+#
+# Uma posição é identificada pela mão de quem joga, pelas peças do tabuleiro e
+# pelas extremidades em forma canônica (menor número à esquerda; se for preciso
+# trocá-las, o lado da jogada também é trocado). A chave é o hash de Zobrist de
+# ai.compute_mask_hash com a mão no lugar do jogador raiz e o tabuleiro no do
+# oponente.
+#
+# Formato do arquivo: um cabeçalho HEADER seguido de registros RECORD (chave,
+# código da jogada = índice da peça * 2 + lado, valor médio) ordenados pela
+# chave. A consulta é uma busca binária sobre o arquivo mapeado em memória, que
+# só é aberto na primeira consulta. O cabeçalho guarda o conjunto de peças
+# (max_dots) do livro, e partidas com outro conjunto não o consultam.
+
+MAGIC = b'DOMB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHI')   # magic, versão, max_dots, decisões por jogador, registros
+RECORD = struct.Struct('<QHh')      # chave, código da jogada, valor
+
+def book_key(hand_mask, board_mask, ends):
+    """
+    Retorna (chave, trocada) da posição em forma canônica.
+
+    trocada indica que as extremidades foram invertidas, e com elas o lado das
+    jogadas.
+    """
+    swapped = ends[0] is not None and ends[1] is not None and ends[0] > ends[1]
+    if swapped:
+        ends = (ends[1], ends[0])
+    return compute_mask_hash(ends, hand_mask, board_mask, True), swapped
+
+def _flip_side(side):
+    return 'right' if side == 'left' else 'left'
+
+def write_book(path, entries, max_dots=6, plies=0):
+    """
+    Grava o livro. entries é um dicionário chave -> (jogada, valor), com a jogada
+    no formato (índice da peça, lado) e já em forma canônica.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, max_dots, plies, len(entries)))
+        for key in sorted(entries):
+            (idx, side), score = entries[key]
+            score = max(-32768, min(32767, int(round(score))))
+            f.write(RECORD.pack(key, idx * 2 + (side == 'right'), score))
+    os.replace(tmp_path, path)  # leitores nunca veem um arquivo pela metade
+
+class OpeningBook:
+    """
+    Livro de aberturas gravado por write_book.
+
+    O arquivo só é aberto e mapeado em memória na primeira consulta, de modo que
+    criar um OpeningBook não custa nada na inicialização. Processos que usam o
+    mesmo arquivo compartilham as páginas mapeadas.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.max_dots = None
+        self.plies = None
+        self.count = 0
+        self.hits = 0
+        self._file = None
+        self._map = None
+
+    def _open(self):
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_dots, self.plies, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{self.path} não é um livro de aberturas válido")
+
+    def __len__(self):
+        if self._map is None:
+            self._open()
+        return self.count
+
+    def probe(self, hand_mask, board_mask, ends):
+        """Retorna ((índice da peça, lado), valor) para a posição, ou None se não estiver no livro."""
+        if self._map is None:
+            self._open()
+        key, swapped = book_key(hand_mask, board_mask, ends)
+
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            mid_key = RECORD.unpack_from(self._map, HEADER.size + mid * RECORD.size)[0]
+            if mid_key < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low == self.count:
+            return None
+        found_key, code, score = RECORD.unpack_from(self._map, HEADER.size + low * RECORD.size)
+        if found_key != key:
+            return None
+
+        idx, side = code >> 1, 'right' if code & 1 else 'left'
+        if swapped:
+            side = _flip_side(side)
+        if (idx, side) not in bitboard.get_valid_moves(hand_mask, ends):
+            return None
+        self.hits += 1
+        return (idx, side), score
+
+    def lookup(self, ends, player_pieces, board, max_dots=6):
+        """
+        Retorna (peça, lado) da jogada do livro para a mão e o tabuleiro fornecidos,
+        ou None. max_dots é o conjunto de peças da partida: um livro gerado para
+        outro conjunto não responde.
+        """
+        if self._map is None:
+            self._open()
+        if max_dots != self.max_dots:
+            return None
+        entry = self.probe(bitboard.pieces_to_mask(player_pieces), bitboard.pieces_to_mask(board), ends)
+        if entry is None:
+            return None
+        idx, side = entry[0]
+        for piece in player_pieces:
+            if piece.index == idx:
+                return piece, side
+
+    def close(self):
+        """Libera o mapeamento e o arquivo."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __getstate__(self):
+        # Enviado a outro processo, o livro é reaberto lá na primeira consulta
+        state = self.__dict__.copy()
+        state['_file'] = state['_map'] = None
+        return state
+
+class BookBuilderPlayer(Player):
+    """
+    Jogador de autojogo que busca a fundo as suas primeiras plies decisões de
+    cada partida (passes e compras não contam) e anota o resultado em entries;
+    depois delas joga a peça de maior valor, só para encerrar a partida.
+    """
+
+    def __init__(self, name, pieces, entries, plies, samples, depth, rng):
+        super().__init__(name, pieces)
+        self.entries = entries
+        self.plies = plies
+        self.samples = samples
+        self.depth = depth
+        self.rng = rng
+        self.decisions = 0
+
+    def make_move(self, game):
+        from determinization import Belief, find_best_move_imperfect
+
+        moves = self.get_valid_moves(game.ends)
+        if not moves:
+            return None, None
+        self.decisions += 1
+        if self.decisions > self.plies or len(moves) == 1:
+            _, piece, side = max(moves, key=lambda move: move[1].value)
+            return piece, side
+
+        stats = SearchStats()
+        piece, side = find_best_move_imperfect(game.ends, self.pieces, Belief.from_game(game, self),
+                                               difficulty=DifficultyLevel.HARD, samples=self.samples,
+                                               rng=self.rng, depth=self.depth, stats=stats, in_place=True)
+        key, swapped = book_key(self.hand_mask, bitboard.pieces_to_mask(game.board), game.ends)
+        if key not in self.entries:
+            book_side = _flip_side(side) if swapped else side
+            self.entries[key] = ((piece.index, book_side), (stats.score or 0) / self.samples)
+        return piece, side
+
+def build_game(seed, plies=4, samples=64, depth=8, max_dots=6, pieces_per_player=7):
+    """Joga uma partida de autojogo e retorna as entradas do livro encontradas nela."""
+    rng = random.Random(seed)
+    hands, stock = shuffle_and_distribute(generate_domino_set(max_dots), pieces_per_player=pieces_per_player,
+                                          rng=rng)
+    entries = {}
+    players = [BookBuilderPlayer(name, hand, entries, plies, samples, depth, rng)
+               for name, hand in zip(('a', 'b'), hands)]
+    DominoGame(players, stock, verbose=False, interactive=False).start()
+    return entries
+
+def build_book(games, plies=4, samples=64, depth=8, seed=0, processes=1, max_dots=6, pieces_per_player=7):
+    """
+    Gera as entradas do livro a partir de games partidas de autojogo com as
+    sementes seed, seed+1, ... Quando uma posição aparece em mais de uma partida,
+    vale a da menor semente, de modo que o resultado não depende de processes.
+    """
+    task = functools.partial(build_game, plies=plies, samples=samples, depth=depth, max_dots=max_dots,
+                             pieces_per_player=pieces_per_player)
+    seeds = range(seed, seed + games)
+    if processes <= 1:
+        return _merge_entries(map(task, seeds))
+    with multiprocessing.Pool(processes) as pool:
+        return _merge_entries(pool.imap(task, seeds, max(1, games // (processes * 8))))
+
+def _merge_entries(results):
+    """Junta as entradas de cada partida, na ordem das sementes."""
+    entries = {}
+    for game_entries in results:
+        for key, value in game_entries.items():
+            entries.setdefault(key, value)
+    return entries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um livro de aberturas por autojogo e busca profunda.")
+    parser.add_argument('-o', '--output', required=True, help="arquivo do livro")
+    parser.add_argument('-n', '--games', type=int, default=1000)
+    parser.add_argument('--plies', type=int, default=4, help="decisões de cada jogador por partida guardadas no livro")
+    parser.add_argument('--samples', type=int, default=64, help="determinizações por decisão")
+    parser.add_argument('--depth', type=int, default=8, help="profundidade da busca de cada determinização")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-p', '--processes', type=int, default=1)
+    parser.add_argument('--max-dots', type=int, default=6)
+    parser.add_argument('--pieces', type=int, default=7, help="peças por jogador")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    entries = build_book(args.games, args.plies, args.samples, args.depth, args.seed, args.processes,
+                         args.max_dots, args.pieces)
+    write_book(args.output, entries, args.max_dots, args.plies)
+    print(json.dumps({'positions': len(entries), 'bytes': os.path.getsize(args.output),
+                      'seconds': round(time.perf_counter() - start, 3)}), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
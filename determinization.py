@@ -0,0 +1,255 @@
+import random
+import time
+
+import bitboard
+import endgame
+from ai import (DifficultyLevel, MoveOrdering, SearchBudget, SearchTimeout, compute_mask_hash, get_search_depth,
+                order_moves, score_root_moves, weights_key)
+
+# Busca com informação imperfeita por determinização: em vez de olhar a mão do
+# oponente, sorteia mãos compatíveis com o que já foi observado na partida, busca
+# cada uma como se a informação fosse perfeita e soma os valores de cada jogada.
+
+def set_max_dots(tile_count):
+    """Retorna o maior número de um conjunto completo com tile_count peças."""
+    max_dots = 0
+    while (max_dots + 1) * (max_dots + 2) // 2 < tile_count:
+        max_dots += 1
+    return max_dots
+
+def full_set_mask(max_dots):
+    """Máscara com todas as peças de um conjunto duplo-max_dots."""
+    return (1 << (bitboard.tile_index(max_dots, max_dots) + 1)) - 1
+
+def pips_mask(max_dots, numbers):
+    """Máscara das peças do conjunto que contêm algum dos números fornecidos."""
+    mask = 0
+    for number in numbers:
+        mask |= bitboard.PIP_MASKS[number]
+    return mask & full_set_mask(max_dots)
+
+class Belief:
+    """
+    O que um jogador sabe sobre a mão do oponente.
+
+    unknown_mask são as peças que ele não vê (mão do oponente mais monte). A mão
+    do oponente é descrita por grupos [quantidade, máscara proibida]: cada compra
+    ou passe do oponente proíbe, para todas as peças que ele tinha naquele
+    momento, os números das extremidades; peças compradas depois formam um novo
+    grupo sem restrições. Quando uma peça jogada poderia ter vindo de mais de um
+    grupo, eles são fundidos, de modo que as restrições nunca excluem a mão real.
+    """
+
+    def __init__(self, unknown_mask, opponent_count, groups):
+        self.unknown_mask = unknown_mask
+        self.opponent_count = opponent_count
+        self.groups = groups
+
+    @classmethod
+    def from_game(cls, game, player):
+        """Constrói a crença do jogador a partir do estado público de um DominoGame."""
+        opponent = game.get_opponent(player)
+        opponent_idx = game.players.index(opponent)
+        tile_count = len(game.board) + len(game.stock) + sum(len(p.pieces) for p in game.players)
+        max_dots = set_max_dots(tile_count)
+
+        known = bitboard.pieces_to_mask(player.pieces) | bitboard.pieces_to_mask(game.board)
+        unknown_mask = full_set_mask(max_dots) & ~known
+
+        plays = sum(1 for e in game.history if e[0] == 'play' and e[1] == opponent_idx)
+        draws = sum(1 for e in game.history if e[0] == 'draw' and e[1] == opponent_idx)
+        groups = [[len(opponent.pieces) + plays - draws, 0]]
+
+        for event in game.history:
+            if event[1] != opponent_idx:
+                continue
+            if event[0] == 'play':
+                tile_bit = event[2].bit
+                compatible = [group for group in groups if not group[1] & tile_bit] or groups
+                if len(compatible) > 1:
+                    # Não se sabe de qual grupo a peça saiu: os grupos possíveis são
+                    # fundidos, mantendo só as restrições comuns a todos
+                    merged = [sum(group[0] for group in compatible), compatible[0][1]]
+                    for group in compatible[1:]:
+                        merged[1] &= group[1]
+                    groups = [group for group in groups if group not in compatible] + [merged]
+                    compatible = [merged]
+                compatible[0][0] -= 1
+            else:  # 'draw' ou 'pass'
+                ends = [end for end in event[2] if end is not None]
+                forbidden = pips_mask(max_dots, ends)
+                for group in groups:
+                    group[1] |= forbidden
+                if event[0] == 'draw':
+                    groups.append([1, 0])
+            groups = [group for group in groups if group[0]]
+
+        return cls(unknown_mask, len(opponent.pieces), groups)
+
+    def is_determined(self):
+        """Indica se só existe uma mão possível para o oponente."""
+        return self.opponent_count == bin(self.unknown_mask).count('1')
+
+    def sample(self, rng=random):
+        """Sorteia uma mão do oponente (máscara) compatível com as restrições."""
+        if self.is_determined():
+            return self.unknown_mask
+
+        available = self.unknown_mask
+        hand = 0
+        # Os grupos mais restritos escolhem primeiro
+        for count, forbidden in sorted(self.groups, key=lambda g: -bin(g[1]).count('1')):
+            candidates = list(bitboard.iter_tiles(available & ~forbidden))
+            if len(candidates) < count:
+                # As restrições são aproximadas; completa com qualquer peça restante
+                candidates = list(bitboard.iter_tiles(available))
+            for idx in rng.sample(candidates, count):
+                hand |= 1 << idx
+            available &= ~hand
+        return hand
+
+def sample_opponent_hands(belief, count, rng=random):
+    """
+    Sorteia count mãos do oponente de uma vez e agrupa as repetidas.
+
+    Retorna uma lista de (máscara, peso), para que mãos iguais sejam buscadas uma
+    única vez.
+    """
+    if belief.is_determined():
+        return [(belief.unknown_mask, count)]
+    weights = {}
+    for _ in range(count):
+        hand = belief.sample(rng)
+        weights[hand] = weights.get(hand, 0) + 1
+    return list(weights.items())
+
+def belief_key(ends, player_mask, belief, difficulty, samples, weights=None):
+    """
+    Chave da decisão para o poscache.PositionCache: extremidades, mão do jogador,
+    o que ele sabe da mão do oponente e a configuração da busca (incluindo os
+    pesos da avaliação, se não forem os padrão).
+    """
+    from poscache import mix_key
+
+    key = compute_mask_hash(ends, player_mask, belief.unknown_mask, True)
+    groups = [value for group in sorted(map(tuple, belief.groups)) for value in group]
+    key = mix_key(key, difficulty, samples, belief.opponent_count, *groups)
+    return key if weights is None else mix_key(key, weights_key(weights))
+
+def find_best_move_imperfect(ends, player_pieces, belief, difficulty=DifficultyLevel.MEDIUM, samples=16,
+                             rng=random, time_limit=None, depth=None, pool=None, stats=None, solver=None,
+                             root_first=True, in_place=False, cache=None, weights=None, table=None):
+    """
+    Escolhe a jogada somando, para cada jogada, o valor obtido em cada mão sorteada
+    para o oponente.
+
+    samples é o número de determinizações; com time_limit (segundos), as amostras
+    que não couberem no tempo são descartadas (ao menos uma é sempre concluída).
+    Com um parallel.SearchPool, as amostras são distribuídas entre processos (e
+    time_limit é ignorado). Um ai.SearchStats recebe os contadores somados de
+    todas as amostras. Quando a mão do oponente é conhecida (monte vazio) e o
+    final é pequeno, ele é resolvido exatamente, como em ai.find_best_move.
+    in_place=True busca as amostras com um único inplace.InPlaceSearch (exceto
+    no modo fácil). Com um poscache.PositionCache e sem time_limit, a decisão é
+    guardada em disco (chave de belief_key) e reaproveitada quando a mesma
+    situação se repete. weights (um ai.EvalWeights) substitui os pesos padrão da
+    avaliação. Uma ai.TranspositionTable em table é compartilhada por todas as
+    amostras (a chave cobre as duas mãos) e pode ser reaproveitada entre as
+    jogadas da partida. Retorna (peça, lado) ou None se não houver jogada.
+    """
+    start = time.perf_counter()
+    player_mask = bitboard.pieces_to_mask(player_pieces)
+    moves = bitboard.get_valid_moves(player_mask, ends)
+    if not moves:
+        return None
+
+    if difficulty == DifficultyLevel.EASY:
+        # Para dificuldade fácil, ignora algumas jogadas aleatoriamente para decisões subótimas
+        moves = rng.sample(moves, max(1, len(moves) // 2))
+
+    if len(moves) > 1 and difficulty != DifficultyLevel.EASY and belief.is_determined() \
+            and endgame.use_endgame_solver(player_mask, belief.unknown_mask, 0):
+        if solver is None:
+            solver = endgame.EndgameSolver()
+        order_moves(moves, 0)
+        winning = solver.winning_moves(ends, player_mask, belief.unknown_mask, root_first, moves)
+        if winning:
+            if stats is not None:
+                stats.seconds = time.perf_counter() - start
+                stats.move = winning[0]
+                stats.solved = True
+            moves = winning[:1]
+
+    if depth is None:
+        depth = get_search_depth(difficulty)
+    cache_key = None
+    if len(moves) > 1 and cache is not None and difficulty != DifficultyLevel.EASY and time_limit is None:
+        cache_key = belief_key(ends, player_mask, belief, difficulty, samples, weights)
+        entry = cache.get(cache_key, depth)
+        if entry is not None and entry[2] in moves:
+            if stats is not None:
+                stats.cached = True
+            moves = [entry[2]]
+            cache_key = None
+
+    if len(moves) > 1:
+        weighted_hands = sample_opponent_hands(belief, samples, rng)
+        if table is not None:
+            table.new_search()
+        if pool is not None and len(weighted_hands) > 1:
+            totals = pool.score_samples(ends, player_mask, weighted_hands, depth, difficulty, moves, weights)
+        else:
+            engine = None
+            if in_place and difficulty != DifficultyLevel.EASY:
+                from inplace import InPlaceSearch
+                
+                engine = InPlaceSearch(difficulty, table, stats, weights)
+            totals = _score_samples(ends, player_mask, weighted_hands, depth, difficulty, moves, time_limit,
+                                    stats, engine, weights, table, rng)
+
+        # Em caso de empate prevalece a ordem de moves
+        best = max(moves, key=lambda move: totals[move])
+        if cache_key is not None:
+            cache.put(cache_key, depth, totals[best] / samples, best)
+    else:
+        best = moves[0]
+
+    if stats is not None:
+        stats.seconds = time.perf_counter() - start
+        stats.depth = depth
+        stats.move = best
+        stats.score = totals[best] if len(moves) > 1 else None
+
+    idx, side = best
+    for piece in player_pieces:
+        if piece.index == idx:
+            return piece, side
+
+def _score_samples(ends, player_mask, weighted_hands, depth, difficulty, moves, time_limit=None, stats=None,
+                   engine=None, weights=None, table=None, rng=random):
+    """
+    Soma os valores de cada jogada sobre as mãos sorteadas, no processo atual.
+
+    Com um inplace.InPlaceSearch, todas as amostras são buscadas por ele (com a
+    tabela do engine); senão, por ai.score_root_moves com table.
+    """
+    totals = dict.fromkeys(moves, 0)
+    ordering = MoveOrdering()
+    budget = SearchBudget(time_limit) if time_limit is not None else None
+    completed = 0
+
+    for opponent_mask, weight in weighted_hands:
+        try:
+            if engine is not None:
+                scores = engine.score_moves(ends, player_mask, opponent_mask, depth, moves,
+                                            budget if completed else None)
+            else:
+                scores = score_root_moves(ends, player_mask, opponent_mask, depth, difficulty, table,
+                                          budget=budget if completed else None, ordering=ordering,
+                                          moves=moves, stats=stats, weights=weights, rng=rng)
+        except SearchTimeout:
+            break
+        for move, score in scores:
+            totals[move] += score * weight
+        completed += weight
+    return totals
@@ -0,0 +1,101 @@
+import bitboard
+from bitboard import TILE_VALUE
+
+# Resolução exata do final de jogo. Com o monte vazio não há mais compra: quem não
+# tem jogada passa, dois passes seguidos travam o jogo e vence quem tiver menos
+# pontos na mão (no empate, quem senta primeiro na mesa, como em
+# DominoGame.check_win_condition). Nessa situação a árvore é pequena o bastante
+# para ser resolvida até o fim.
+
+ENDGAME_TILE_THRESHOLD = 12  # total de peças nas duas mãos até o qual o solver é usado
+
+def _hand_value(mask):
+    """Soma dos pontos das peças da máscara."""
+    total = 0
+    while mask:
+        low_bit = mask & -mask
+        mask ^= low_bit
+        total += TILE_VALUE[low_bit.bit_length() - 1]
+    return total
+
+class EndgameSolver:
+    """
+    Resolve finais de jogo com o monte vazio, com memorização das posições.
+
+    Uma instância pode ser reaproveitada entre as jogadas de uma partida: as
+    posições já resolvidas continuam válidas. max_entries limita a memória.
+    """
+
+    def __init__(self, max_entries=1 << 20):
+        self.max_entries = max_entries
+        self.memo = {}
+        self.nodes = 0
+
+    def wins(self, ends, mover_mask, other_mask, passed=False, mover_is_root=True, root_first=True):
+        """
+        Indica se quem joga vence com jogo perfeito dos dois lados.
+
+        passed indica que a jogada anterior foi um passe; root_first indica se o
+        jogador raiz senta primeiro na mesa (desempate do jogo travado).
+        """
+        if len(self.memo) > self.max_entries:
+            self.memo.clear()
+        return self._wins(ends, mover_mask, other_mask, passed, mover_is_root, root_first)
+
+    def _wins(self, ends, mover_mask, other_mask, passed, mover_is_root, root_first):
+        self.nodes += 1
+        left, right = ends
+        if left is not None and right is not None and left > right:
+            left, right = right, left  # extremidades trocadas dão a mesma posição
+        key = (mover_mask, other_mask, left, right, passed, mover_is_root == root_first)
+        result = self.memo.get(key)
+        if result is not None:
+            return result
+
+        moves = bitboard.get_valid_moves(mover_mask, ends)
+        if not moves:
+            if passed:
+                # Jogo travado: vence quem tem menos pontos; no empate, quem senta primeiro
+                mover_sum = _hand_value(mover_mask)
+                other_sum = _hand_value(other_mask)
+                result = mover_sum < other_sum or (mover_sum == other_sum and mover_is_root == root_first)
+            else:
+                result = not self._wins(ends, other_mask, mover_mask, True, not mover_is_root, root_first)
+        else:
+            result = False
+            seen = set()
+            for idx, side in moves:
+                new_mask, new_ends = bitboard.apply_move(mover_mask, idx, side, ends)
+                if not new_mask:
+                    result = True
+                    break
+                # Jogar a mesma peça dos dois lados pode levar às mesmas extremidades
+                canonical = (idx, min(new_ends), max(new_ends))
+                if canonical in seen:
+                    continue
+                seen.add(canonical)
+                if not self._wins(new_ends, other_mask, new_mask, False, not mover_is_root, root_first):
+                    result = True
+                    break
+
+        self.memo[key] = result
+        return result
+
+    def winning_moves(self, ends, player_mask, opponent_mask, root_first=True, moves=None):
+        """Retorna, na ordem de moves, as jogadas da raiz que garantem a vitória."""
+        if len(self.memo) > self.max_entries:
+            self.memo.clear()
+        if moves is None:
+            moves = bitboard.get_valid_moves(player_mask, ends)
+        winning = []
+        for idx, side in moves:
+            new_mask, new_ends = bitboard.apply_move(player_mask, idx, side, ends)
+            if not new_mask or not self._wins(new_ends, opponent_mask, new_mask, False, False, root_first):
+                winning.append((idx, side))
+        return winning
+
+def use_endgame_solver(player_mask, opponent_mask, stock_size, threshold=ENDGAME_TILE_THRESHOLD):
+    """Indica se a posição é um final (monte vazio) pequeno o bastante para o solver."""
+    if stock_size != 0 or threshold is None:
+        return False
+    return bin(player_mask).count('1') + bin(opponent_mask).count('1') <= threshold
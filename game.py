@@ -1,29 +1,97 @@
+import bitboard
 from colors import Color
 
+# Regras de compra de quem não tem jogada: 'one' compra uma peça e passa se ela
+# não servir, 'until_playable' compra até achar uma peça que sirva (ou o monte
+# acabar) e 'none' passa sem comprar (dominó bloqueado).
+DRAW_RULES = ('one', 'until_playable', 'none')
+
 class DominoGame:
-    """Classe principal para gerenciar o jogo de dominó."""
+    """
+    Classe principal para gerenciar o jogo de dominó.
+
+    draw_rule escolhe a regra de compra (ver DRAW_RULES). Com auto_forced=True,
+    uma jogada única é feita pelo próprio jogo, sem consultar o jogador.
+
+    players são os jogadores da mesa, dois ou mais, na ordem em que jogam. teams
+    dá o time de cada lugar (por exemplo [0, 1, 0, 1] para duplas); sem ele cada
+    jogador joga por si.
+
+    O construtor recebia antes os dois jogadores separados,
+    DominoGame(player1, player2, stock, ...); a forma atual é
+    DominoGame([player1, player2], stock, ...).
+    """
     
-    def __init__(self, player1, player2, stock):
+    def __init__(self, players, stock, verbose=True, interactive=True, draw_rule='one',
+                 auto_forced=False, teams=None):
+        if draw_rule not in DRAW_RULES:
+            raise ValueError(f"Regra de compra desconhecida: {draw_rule}")
+        try:
+            players = list(players)
+        except TypeError:
+            raise TypeError("players deve ser a lista de jogadores: "
+                            "DominoGame([player1, player2], stock, ...)") from None
+        if len(players) < 2:
+            raise ValueError("uma partida precisa de pelo menos dois jogadores")
+        if teams is not None and len(teams) != len(players):
+            raise ValueError("teams deve ter um time para cada jogador")
         self.board = []
         self.ends = (None, None)  # (extremidade esquerda, extremidade direita)
-        self.players = [player1, player2]
+        self.players = players
         self.stock = stock
         self.current_player_idx = 0
         self.pass_count = 0
         self.game_over = False
+        # Eventos públicos da partida, na ordem em que ocorreram:
+        # ('play', jogador, peça, lado), ('draw', jogador, extremidades) e
+        # ('pass', jogador, extremidades). Compra e passe revelam que o jogador não
+        # tinha nenhuma peça com os números das extremidades.
+        self.history = []
+        self.verbose = verbose          # imprime o andamento da partida
+        self.interactive = interactive  # espera Enter entre os turnos
+        self.turns = 0
+        self.winner = None
+        self.end_reason = None  # 'domino' (alguém ficou sem peças) ou 'blocked' (jogo travado)
+        self.draw_rule = draw_rule
+        self.auto_forced = auto_forced
+        self.teams = teams
+        self.winning_team = None
+        # Peças que encaixam em alguma extremidade, atualizada a cada jogada: as
+        # jogadas de um jogador existem se a interseção com a sua mão não for vazia
+        self.playable_mask = bitboard.ALL_TILES
+        self._max_dots = None
+    
+    def _log(self, *args, **kwargs):
+        """Imprime uma mensagem se a partida não for silenciosa."""
+        if self.verbose:
+            print(*args, **kwargs)
     
     @property
     def current_player(self):
         """Retorna o jogador atual."""
         return self.players[self.current_player_idx]
     
+    @property
+    def max_dots(self):
+        """Maior número do conjunto em jogo (6 no duplo-6, 9 no duplo-9, ...)."""
+        if self._max_dots is None:
+            tiles = self.board + self.stock
+            for player in self.players:
+                tiles += player.pieces
+            self._max_dots = max(max(piece.left, piece.right) for piece in tiles)
+        return self._max_dots
+    
+    def team_of(self, player_idx):
+        """Retorna o time do jogador no lugar player_idx."""
+        return self.teams[player_idx] if self.teams is not None else player_idx
+    
     def get_opponent(self, player):
-        """Retorna o oponente do jogador fornecido."""
+        """Retorna o oponente do jogador fornecido (partidas de dois jogadores)."""
         return self.players[0] if player == self.players[1] else self.players[1]
     
     def next_player(self):
-        """Troca para o próximo jogador."""
-        self.current_player_idx = 1 - self.current_player_idx
+        """Passa a vez ao próximo jogador da mesa."""
+        self.current_player_idx = (self.current_player_idx + 1) % len(self.players)
     
     def find_starting_player(self):
         """Determina o jogador e a peça que iniciam o jogo."""
@@ -54,10 +122,13 @@ class DominoGame:
         """Atualiza as extremidades do tabuleiro após uma jogada."""
         if not self.board:
             self.ends = (None, None)
+            self.playable_mask = bitboard.ALL_TILES
+            return
         elif len(self.board) == 1:
             self.ends = (self.board[0].left, self.board[0].right)
         else:
             self.ends = (self.board[0].left, self.board[-1].right)
+        self.playable_mask = bitboard.PIP_MASKS[self.ends[0]] | bitboard.PIP_MASKS[self.ends[1]]
     
     def apply_move(self, piece, side):
         """Aplica uma jogada no tabuleiro."""
@@ -81,58 +152,92 @@ class DominoGame:
     def display_board(self):
         """Exibe o tabuleiro atual."""
         if not self.board:
-            print("\nO tabuleiro está vazio.")
+            self._log("\nO tabuleiro está vazio.")
             return
         
-        print(f"\n{Color.CYAN}Tabuleiro:{Color.RESET}", end=" ")
+        self._log(f"\n{Color.CYAN}Tabuleiro:{Color.RESET}", end=" ")
         
         for piece in self.board:
-            print(piece, end=" ")
+            self._log(piece, end=" ")
         
-        print(f"\n{Color.CYAN}Extremidades:{Color.RESET} Esquerda={self.ends[0]}, Direita={self.ends[1]}")
+        self._log(f"\n{Color.CYAN}Extremidades:{Color.RESET} Esquerda={self.ends[0]}, Direita={self.ends[1]}")
     
     def display_game_state(self):
         """Exibe o estado completo do jogo."""
-        print(f"\n{Color.MAGENTA}{'='*50}{Color.RESET}")
+        self._log(f"\n{Color.MAGENTA}{'='*50}{Color.RESET}")
         self.display_board()
-        print(f"\n{Color.YELLOW}Monte:{Color.RESET} {len(self.stock)} peças restantes")
+        self._log(f"\n{Color.YELLOW}Monte:{Color.RESET} {len(self.stock)} peças restantes")
         
         for player in self.players:
             if player == self.current_player:
-                print(f"{Color.GREEN}➤ {player.name}:{Color.RESET} {len(player.pieces)} peças")
+                self._log(f"{Color.GREEN}➤ {player.name}:{Color.RESET} {len(player.pieces)} peças")
             else:
-                print(f"  {player.name}: {len(player.pieces)} peças")
+                self._log(f"  {player.name}: {len(player.pieces)} peças")
         
-        print(f"{Color.MAGENTA}{'='*50}{Color.RESET}\n")
+        self._log(f"{Color.MAGENTA}{'='*50}{Color.RESET}\n")
     
     def check_win_condition(self):
         """Verifica se o jogo foi vencido ou está travado."""
         # Verifica se algum jogador ficou sem peças
-        for player in self.players:
+        for player_idx, player in enumerate(self.players):
             if not player.pieces:
-                print(f"\n{Color.GREEN}🏆 {player.name} venceu! Ficou sem peças.{Color.RESET}")
+                self._log(f"\n{Color.GREEN}🏆 {player.name} venceu! Ficou sem peças.{Color.RESET}")
+                self.winner = player
+                self.winning_team = self.team_of(player_idx)
+                self.end_reason = 'domino'
                 return True
         
-        # Verifica se o jogo está travado (ninguém pode jogar e o monte acabou)
-        if self.pass_count >= len(self.players) and not self.stock:
-            print(f"\n{Color.YELLOW}Jogo travado. Calculando vencedor...{Color.RESET}")
+        # Verifica se o jogo está travado (ninguém pode jogar e não há o que comprar)
+        if self.pass_count >= len(self.players) and (not self.stock or self.draw_rule == 'none'):
+            self._log(f"\n{Color.YELLOW}Jogo travado. Calculando vencedor...{Color.RESET}")
             
             # Soma os pontos de cada jogador
             scores = [(player, sum(p.get_value() for p in player.pieces)) for player in self.players]
             scores.sort(key=lambda x: x[1])
             
-            print(f"\nPontuações finais:")
+            if self.teams is not None:
+                # Vence o time com menos pontos somados; dentro dele, o jogador com menos pontos
+                team_scores = {}
+                for team, player in zip(self.teams, self.players):
+                    team_scores[team] = team_scores.get(team, 0) + sum(p.get_value() for p in player.pieces)
+                self.winning_team = min(team_scores, key=lambda team: (team_scores[team], self.teams.index(team)))
+                self._log(f"\nPontuações dos times: " +
+                          ", ".join(f"time {team}: {score}" for team, score in team_scores.items()))
+                scores.sort(key=lambda x: self.team_of(self.players.index(x[0])) != self.winning_team)
+            
+            self._log(f"\nPontuações finais:")
             for player, score in scores:
-                print(f"{player.name}: {score} pontos")
+                self._log(f"{player.name}: {score} pontos")
             
-            print(f"\n{Color.GREEN}🏆 {scores[0][0].name} venceu com {scores[0][1]} pontos!{Color.RESET}")
+            self._log(f"\n{Color.GREEN}🏆 {scores[0][0].name} venceu com {scores[0][1]} pontos!{Color.RESET}")
+            self.winner = scores[0][0]
+            if self.teams is None:
+                self.winning_team = self.players.index(self.winner)
+            self.end_reason = 'blocked'
             return True
         
         return False
     
-    def start(self):
-        """Inicia e executa o jogo."""
-        print(f"{Color.GREEN}Iniciando o jogo de dominó!{Color.RESET}")
+    def result(self):
+        """
+        Retorna um resumo da partida encerrada (vencedor, motivo, pontos, turnos e,
+        em partidas por times, o time vencedor).
+        """
+        summary = {
+            'winner': self.players.index(self.winner) if self.winner is not None else None,
+            'winner_name': self.winner.name if self.winner is not None else None,
+            'reason': self.end_reason,
+            'pips': [sum(p.get_value() for p in player.pieces) for player in self.players],
+            'tiles_left': [len(player.pieces) for player in self.players],
+            'turns': self.turns,
+        }
+        if self.teams is not None:
+            summary['team'] = self.winning_team
+        return summary
+    
+    def begin(self):
+        """Coloca a peça inicial e passa a vez ao próximo jogador."""
+        self._log(f"{Color.GREEN}Iniciando o jogo de dominó!{Color.RESET}")
         
         # Determina o jogador e peça iniciais
         player_idx, starting_piece = self.find_starting_player()
@@ -141,67 +246,106 @@ class DominoGame:
         # Coloca a peça inicial no tabuleiro e remove da mão do jogador
         self.current_player.remove_piece(starting_piece)
         self.apply_move(starting_piece, 'esquerda')
+        self.history.append(('play', self.current_player_idx, starting_piece, 'left'))
         
-        print(f"\n{Color.YELLOW}{self.current_player.name} começa com {starting_piece}{Color.RESET}")
+        self._log(f"\n{Color.YELLOW}{self.current_player.name} começa com {starting_piece}{Color.RESET}")
         
         # Troca para o próximo jogador
         self.next_player()
-        
-        # Loop principal do jogo
-        while not self.game_over:
+    
+    def prepare_turn(self):
+        """
+        Inicia o turno do jogador atual e resolve o que não depende dele: sem
+        jogada válida, ele compra do monte conforme draw_rule ou passa; com
+        auto_forced, uma jogada única é feita aqui.
+
+        Retorna True se o jogador deve escolher uma jogada (ver play) e False se o
+        turno já terminou.
+        """
+        self.turns += 1
+        if self.verbose:
             self.display_game_state()
-            
-            if not self.current_player.has_valid_move(self.ends):
-                print(f"{Color.YELLOW}{self.current_player.name} não tem jogadas válidas.{Color.RESET}")
-                
-                if self.stock:
+        
+        player = self.current_player
+        playable = player.hand_mask & self.playable_mask
+        if not playable:
+            self._log(f"{Color.YELLOW}{player.name} não tem jogadas válidas.{Color.RESET}")
+            if self.draw_rule != 'none':
+                while self.stock:
                     # Compra uma peça do monte
+                    self.history.append(('draw', self.current_player_idx, self.ends))
                     drawn_piece = self.stock.pop()
-                    self.current_player.add_piece(drawn_piece)
-                    print(f"{self.current_player.name} compra uma peça do monte.")
+                    player.add_piece(drawn_piece)
+                    self._log(f"{player.name} compra uma peça do monte.")
                     
                     # Verifica se pode jogar com a peça comprada
-                    if drawn_piece.matches(self.ends[0]) or drawn_piece.matches(self.ends[1]):
-                        self.display_game_state()
-                        piece, side = self.current_player.make_move(self)
-                        
-                        if piece:
-                            self.current_player.remove_piece(piece)
-                            self.apply_move(piece, side)
-                            if side == 'left':
-                                print(f"{self.current_player.name} joga {piece} no lado esquedo.")
-                            else:   
-                                print(f"{self.current_player.name} joga {piece} no lado direito.")
-                            
-                            self.pass_count = 0
-                        else:
-                            print(f"{self.current_player.name} passa a vez.")
-                            self.pass_count += 1
-                    else:
-                        print(f"{self.current_player.name} passa a vez.")
-                        self.pass_count += 1
-                else:
-                    # Sem peças no monte, jogador passa
-                    print(f"{self.current_player.name} passa a vez.")
-                    self.pass_count += 1
-            else:
-                # Jogador faz uma jogada
-                piece, side = self.current_player.make_move(self)
-                
-                if piece:
-                    self.current_player.remove_piece(piece)
-                    self.apply_move(piece, side)
-                    if side == 'left':
-                        print(f"{self.current_player.name} joga {piece} no lado esquedo.")
-                    else:   
-                        print(f"{self.current_player.name} joga {piece} no lado direito.")
-                    self.pass_count = 0
+                    if drawn_piece.bit & self.playable_mask:
+                        playable = drawn_piece.bit
+                        break
+                    if self.draw_rule == 'one':
+                        break
             
-            # Verifica condição de vitória
-            self.game_over = self.check_win_condition()
+            if not playable:
+                self._pass_turn()
+                return False
+            if self.verbose:
+                self.display_game_state()
+        
+        if self.auto_forced and self._play_forced(playable):
+            return False
+        return True
+    
+    def _play_forced(self, playable):
+        """Faz a jogada do jogador atual se ela for a única possível. Retorna True se jogou."""
+        left_mask, right_mask = bitboard.playable_masks(playable, self.ends)
+        moves = left_mask | right_mask
+        if moves & (moves - 1) or left_mask & right_mask:
+            return False
+        for piece in self.current_player.pieces:
+            if piece.bit == moves:
+                self.play(piece, 'left' if left_mask else 'right')
+                return True
+        return False
+    
+    def play(self, piece, side):
+        """Aplica a jogada escolhida pelo jogador atual (piece None é um passe) e encerra o turno."""
+        if piece is None:
+            self._pass_turn()
+            return
+        
+        self.history.append(('play', self.current_player_idx, piece, side))
+        self.current_player.remove_piece(piece)
+        self.apply_move(piece, side)
+        if side == 'left':
+            self._log(f"{self.current_player.name} joga {piece} no lado esquedo.")
+        else:   
+            self._log(f"{self.current_player.name} joga {piece} no lado direito.")
+        self.pass_count = 0
+        self._end_turn()
+    
+    def _pass_turn(self):
+        self._log(f"{self.current_player.name} passa a vez.")
+        self.history.append(('pass', self.current_player_idx, self.ends))
+        self.pass_count += 1
+        self._end_turn()
+    
+    def _end_turn(self):
+        """Verifica a condição de vitória e, se o jogo continua, passa a vez."""
+        self.game_over = self.check_win_condition()
+        if not self.game_over:
+            self.next_player()
+    
+    def start(self):
+        """Inicia e executa o jogo. Retorna o resumo de result()."""
+        self.begin()
+        
+        # Loop principal do jogo
+        while not self.game_over:
+            if self.prepare_turn():
+                piece, side = self.current_player.make_move(self)
+                self.play(piece, side)
             
-            if not self.game_over:
-                # Próxima rodada
-                self.next_player()
+            if not self.game_over and self.interactive:
                 input(f"{Color.GREEN}Pressione Enter para o próximo turno...{Color.RESET}")
-      
+        
+        return self.result()
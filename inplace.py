@@ -0,0 +1,367 @@
+import bitboard
+from ai import (TILE_ORDER_SCORE, ZOBRIST_ENDS, ZOBRIST_MASK_TILES, ZOBRIST_SIDE, DifficultyLevel, EvalAggregates,
+                SearchTimeout, TranspositionTable)
+from bitboard import PIP_MASKS, TILE_COUNT, TILE_HIGH, TILE_LOW
+
+# Busca alfa-beta sobre um único estado mutável. Em vez de criar máscaras,
+# extremidades e listas de jogadas a cada nó, as jogadas são aplicadas e
+# desfeitas no mesmo SearchState (make_move/unmake_move, com uma pilha de
+# desfazer), e as jogadas de cada nível são geradas em listas reaproveitadas.
+#
+# Uma jogada é codificada como um inteiro: índice da peça * 2 + lado (0 esquerda,
+# 1 direita). Os códigos são pequenos e as tuplas (índice, lado) usadas fora da
+# busca vêm de MOVE_TUPLES, então nenhum objeto é criado por jogada.
+
+LEFT = 0
+RIGHT = 1
+SIDE_NAMES = ('left', 'right')
+
+MOVE_TUPLES = [(code >> 1, SIDE_NAMES[code & 1]) for code in range(2 * TILE_COUNT)]
+CODE_ORDER_SCORE = [TILE_ORDER_SCORE[code >> 1] for code in range(2 * TILE_COUNT)]
+TILE_BITS = [1 << idx for idx in range(TILE_COUNT)]
+
+# Extremidade do tabuleiro vazio; -1 + 1 = 0 é também o índice de None em ZOBRIST_ENDS
+EMPTY = -1
+
+def move_code(move):
+    """Converte uma jogada (índice, lado) em código."""
+    idx, side = move
+    return idx * 2 + (RIGHT if side == 'right' else LEFT)
+
+class SearchState:
+    """
+    Estado da busca alterado no lugar.
+
+    masks são as mãos ([0] jogador raiz, [1] oponente), left e right as
+    extremidades (EMPTY com o tabuleiro vazio), mover o índice de quem joga, key
+    o hash de Zobrist (o mesmo de ai.compute_mask_hash) e aggregates os termos
+    da avaliação (ai.EvalAggregates). Cada make_move ou make_pass empilha o que
+    for preciso para unmake_move restaurar o estado anterior.
+    """
+
+    __slots__ = ('masks', 'left', 'right', 'mover', 'key', 'aggregates', 'undo')
+
+    def __init__(self, ends, root_mask, other_mask, difficulty, weights=None):
+        self.masks = [0, 0]
+        self.undo = []
+        self.reset(ends, root_mask, other_mask, difficulty, weights)
+
+    def reset(self, ends, root_mask, other_mask, difficulty, weights=None):
+        """Reinicia o estado com o jogador raiz na vez, reaproveitando o objeto."""
+        self.masks[0] = root_mask
+        self.masks[1] = other_mask
+        self.left = EMPTY if ends[0] is None else ends[0]
+        self.right = EMPTY if ends[1] is None else ends[1]
+        self.mover = 0
+        self.key = self._compute_key()
+        self.aggregates = EvalAggregates(root_mask, other_mask, difficulty, weights)
+        del self.undo[:]
+
+    def _compute_key(self):
+        key = ZOBRIST_ENDS[0][self.left + 1] ^ ZOBRIST_ENDS[1][self.right + 1]
+        for owner in (0, 1):
+            for idx in bitboard.iter_tiles(self.masks[owner]):
+                key ^= ZOBRIST_MASK_TILES[owner][idx]
+        if self.mover:
+            key ^= ZOBRIST_SIDE
+        return key
+
+    @property
+    def ends(self):
+        """Extremidades no formato usado fora da busca (None com o tabuleiro vazio)."""
+        return (None if self.left == EMPTY else self.left, None if self.right == EMPTY else self.right)
+
+    def generate_moves(self, buffer):
+        """
+        Escreve em buffer os códigos das jogadas de quem joga e retorna quantas são.
+
+        A ordem é a de bitboard.get_valid_moves (esquerda, depois direita, por
+        índice), rearrumada de forma estável pela ordem estática de ai.order_moves.
+        """
+        mask = self.masks[self.mover]
+        left = self.left
+        if left == EMPTY:
+            left_mask, right_mask = mask, 0
+        else:
+            left_mask = mask & PIP_MASKS[left]
+            right_mask = 0 if self.right == left else mask & PIP_MASKS[self.right]
+
+        count = 0
+        code_base = LEFT
+        playable = left_mask
+        while True:
+            while playable:
+                low_bit = playable & -playable
+                playable ^= low_bit
+                code = (low_bit.bit_length() - 1) * 2 + code_base
+                score = CODE_ORDER_SCORE[code]
+                # Inserção estável: fica depois das jogadas de valor maior ou igual
+                j = count
+                while j and CODE_ORDER_SCORE[buffer[j - 1]] < score:
+                    buffer[j] = buffer[j - 1]
+                    j -= 1
+                buffer[j] = code
+                count += 1
+            if code_base == RIGHT or not right_mask:
+                break
+            code_base = RIGHT
+            playable = right_mask
+        return count
+
+    def make_move(self, code):
+        """Joga a peça do código na extremidade indicada, pela mão de quem joga."""
+        idx = code >> 1
+        mover = self.mover
+        left = self.left
+        right = self.right
+        undo = self.undo
+        undo.append(self.key)
+        undo.append(left)
+        undo.append(right)
+        undo.append(code)
+
+        low = TILE_LOW[idx]
+        high = TILE_HIGH[idx]
+        if left == EMPTY:  # Primeira peça
+            new_left, new_right = low, high
+        elif code & 1:
+            new_left, new_right = left, (high if low == right else low)
+        else:
+            new_left, new_right = (high if low == left else low), right
+
+        self.key ^= ZOBRIST_MASK_TILES[mover][idx] ^ ZOBRIST_ENDS[0][left + 1] ^ ZOBRIST_ENDS[1][right + 1] \
+            ^ ZOBRIST_ENDS[0][new_left + 1] ^ ZOBRIST_ENDS[1][new_right + 1] ^ ZOBRIST_SIDE
+        self.left = new_left
+        self.right = new_right
+        self.masks[mover] ^= TILE_BITS[idx]
+        self.aggregates.remove(mover, idx)
+        self.mover = 1 - mover
+
+    def make_pass(self):
+        """Passa a vez."""
+        self.undo.append(self.key)
+        self.undo.append(-1)
+        self.key ^= ZOBRIST_SIDE
+        self.mover = 1 - self.mover
+
+    def unmake_move(self):
+        """Desfaz a última jogada ou passe."""
+        undo = self.undo
+        code = undo.pop()
+        mover = 1 - self.mover
+        self.mover = mover
+        if code >= 0:
+            idx = code >> 1
+            self.right = undo.pop()
+            self.left = undo.pop()
+            self.masks[mover] |= TILE_BITS[idx]
+            self.aggregates.restore(mover, idx)
+        self.key = undo.pop()
+
+    def rewind(self, size):
+        """Desfaz jogadas até a pilha de desfazer voltar a ter size entradas."""
+        while len(self.undo) > size:
+            self.unmake_move()
+
+class InPlaceSearch:
+    """
+    Busca alfa-beta com make/unmake sobre um único SearchState.
+
+    Equivale a ai.search_root e ai.score_root_moves com a ordem estática de
+    jogadas (sem MoveOrdering e sem PVS): mesmos valores, mesmas jogadas e mesma
+    contagem de nós, usando a mesma TranspositionTable. Uma instância pode ser
+    reaproveitada entre buscas e jogadas; as listas de jogadas de cada nível são
+    criadas uma vez e reutilizadas. O modo fácil não é suportado, pois a escolha
+    aleatória de jogadas não tem equivalente sem alocação.
+    """
+
+    def __init__(self, difficulty, table=None, stats=None, weights=None):
+        if difficulty == DifficultyLevel.EASY:
+            raise ValueError("InPlaceSearch não suporta o modo fácil")
+        self.difficulty = difficulty
+        self.weights = weights
+        self.table = table
+        self.stats = stats
+        self.budget = None
+        self.state = None
+        self._buffers = []
+
+    def _reset(self, ends, player_mask, opponent_mask):
+        if self.state is None:
+            self.state = SearchState(ends, player_mask, opponent_mask, self.difficulty, self.weights)
+        else:
+            self.state.reset(ends, player_mask, opponent_mask, self.difficulty, self.weights)
+
+    def _buffer(self, ply):
+        """Lista de jogadas do nível ply, criada na primeira vez que o nível é alcançado."""
+        while len(self._buffers) <= ply:
+            self._buffers.append([0] * (2 * TILE_COUNT))
+        return self._buffers[ply]
+
+    def search(self, ends, player_mask, opponent_mask, depth, budget=None, first_move=None):
+        """
+        Equivalente a ai.search_root com ordering=None e pvs=False.
+
+        Retorna (valor, jogada), com a jogada no formato (índice da peça, lado), ou
+        (valor, None) se o jogador raiz não tiver jogadas.
+        """
+        self._reset(ends, player_mask, opponent_mask)
+        self.budget = budget
+        state = self.state
+        stats = self.stats
+        table = self.table
+        try:
+            buffer = self._buffer(0)
+            count = state.generate_moves(buffer)
+            if not count:
+                return self._negamax(depth, float('-inf'), float('inf'), 0), None
+
+            if stats is not None:
+                stats.nodes += 1
+                stats.expanded_nodes += 1
+                stats.moves_generated += count
+            hash_move = first_move
+            if table is not None:
+                entry = table.probe(state.key)
+                if hash_move is None and entry is not None:
+                    hash_move = entry[4]
+            if hash_move is not None:
+                _move_to_front(buffer, count, move_code(hash_move))
+
+            alpha = float('-inf')
+            best_score = float('-inf')
+            best_code = -1
+            for i in range(count):
+                code = buffer[i]
+                state.make_move(code)
+                score = -self._negamax(depth - 1, float('-inf'), -alpha, 1)
+                state.unmake_move()
+                if score > best_score:
+                    best_score = score
+                    best_code = code
+                    alpha = max(alpha, best_score)
+
+            best_move = MOVE_TUPLES[best_code]
+            if table is not None:
+                table.store(state.key, depth, best_score, TranspositionTable.EXACT, best_move)
+            return best_score, best_move
+        except SearchTimeout:
+            state.rewind(0)
+            raise
+
+    def score_moves(self, ends, player_mask, opponent_mask, depth, moves=None, budget=None):
+        """
+        Equivalente a ai.score_root_moves: o valor exato de cada jogada da raiz, como
+        lista de ((índice, lado), valor). moves restringe as jogadas examinadas.
+        """
+        if moves is None:
+            moves = bitboard.get_valid_moves(player_mask, ends)
+        self._reset(ends, player_mask, opponent_mask)
+        self.budget = budget
+        state = self.state
+        scores = []
+        try:
+            for move in moves:
+                state.make_move(move_code(move))
+                score = -self._negamax(depth - 1, float('-inf'), float('inf'), 1)
+                state.unmake_move()
+                scores.append((move, score))
+        except SearchTimeout:
+            state.rewind(0)
+            raise
+        return scores
+
+    def _negamax(self, depth, alpha, beta, ply):
+        """Valor do nó atual do ponto de vista de quem joga (como ai.negamax)."""
+        state = self.state
+        stats = self.stats
+        if self.budget is not None:
+            self.budget.tick()
+        if stats is not None:
+            stats.nodes += 1
+
+        masks = state.masks
+        if depth == 0 or not masks[0] or not masks[1]:
+            if stats is not None:
+                stats.leaf_nodes += 1
+            score = state.aggregates.evaluate()
+            return score if state.mover == 0 else -score
+
+        table = self.table
+        hash_code = -1
+        if table is not None:
+            key = state.key
+            entry = table.probe(key)
+            if entry is not None:
+                if stats is not None:
+                    stats.tt_hits += 1
+                entry_depth, score, flag, hash_move = entry[1], entry[2], entry[3], entry[4]
+                if entry_depth >= depth:
+                    if flag == TranspositionTable.EXACT:
+                        return score
+                    if flag == TranspositionTable.LOWER and score >= beta:
+                        return score
+                    if flag == TranspositionTable.UPPER and score <= alpha:
+                        return score
+                if hash_move is not None:
+                    hash_code = move_code(hash_move)
+            alpha_orig = alpha
+
+        buffer = self._buffer(ply)
+        count = state.generate_moves(buffer)
+
+        if not count:
+            # Passa a vez - troca os jogadores e continua
+            if stats is not None:
+                stats.pass_nodes += 1
+            state.make_pass()
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            state.unmake_move()
+            return score
+
+        if stats is not None:
+            stats.expanded_nodes += 1
+            stats.moves_generated += count
+        if hash_code >= 0 and count > 1:
+            _move_to_front(buffer, count, hash_code)
+
+        best_score = float('-inf')
+        best_code = -1
+        for i in range(count):
+            code = buffer[i]
+            state.make_move(code)
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            state.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_code = code
+            if best_score > alpha:
+                alpha = best_score
+            if beta <= alpha:
+                if stats is not None:
+                    stats.cutoffs += 1
+                    stats.cutoffs_by_depth[depth] = stats.cutoffs_by_depth.get(depth, 0) + 1
+                    if i == 0:
+                        stats.first_move_cutoffs += 1
+                break
+
+        if table is not None:
+            if best_score <= alpha_orig:
+                flag = TranspositionTable.UPPER
+            elif best_score >= beta:
+                flag = TranspositionTable.LOWER
+            else:
+                flag = TranspositionTable.EXACT
+            table.store(key, depth, best_score, flag, MOVE_TUPLES[best_code])
+        return best_score
+
+def _move_to_front(buffer, count, code):
+    """Leva a jogada code (se estiver entre as count primeiras) para o início de buffer."""
+    for i in range(count):
+        if buffer[i] == code:
+            while i:
+                buffer[i] = buffer[i - 1]
+                i -= 1
+            buffer[0] = code
+            return
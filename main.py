@@ -1,9 +1,21 @@
-import random
-from piece import DominoPiece
-from player import Player, AIPlayer, HumanPlayer
-from game import DominoGame
-from utils import generate_domino_set, shuffle_and_distribute
+import argparse
+import sys
+
 from colors import Color
+from game import DRAW_RULES
+
+# Ponto de entrada do jogo no terminal. Só argparse, as cores e as regras são
+# importados na partida do programa: os jogadores e principalmente as IAs (ai.py,
+# determinização) são carregados apenas quando a partida precisa deles,
+# de modo que --help, partidas entre jogadores simples e processos de curta
+# duração iniciem rápido.
+#
+# Jogadores (-1 e -2): 'human', 'random', 'greedy', 'ai' (com a dificuldade de
+# --difficulty) ou uma descrição de simulate.player_factory ('ai:3:perfect',
+# 'ai:2:inplace', ...). Sem jogador humano a partida não espera Enter entre os
+# turnos; --no-pause faz o mesmo em partidas com humano.
+
+PLAYER_NAMES = {'human': 'Jogador', 'ai': 'Computador'}
 
 def get_difficulty_choice():
     """Obtém o nível de dificuldade da IA escolhido pelo usuário."""
@@ -12,7 +24,7 @@ def get_difficulty_choice():
         print(f"  1: {Color.GREEN}Fácil{Color.RESET}")
         print(f"  2: {Color.YELLOW}Médio{Color.RESET}")
         print(f"  3: {Color.RED}Difícil{Color.RESET}")
-        
+
         try:
             choice = int(input("\nDigite a dificuldade (1-3): "))
             if 1 <= choice <= 3:
@@ -21,30 +33,116 @@ def get_difficulty_choice():
         except ValueError:
             print(f"{Color.RED}Por favor, digite um número.{Color.RESET}")
 
-def main():
-    print(f"\n{Color.MAGENTA}===== JOGO DE DOMINÓ ====={Color.RESET}\n")
-    print(f"{Color.CYAN}Bem-vindo ao jogo de dominó no terminal!{Color.RESET}")
-    
+def create_player(spec, name, pieces, difficulty, rng=None):
+    """Cria o jogador descrito por spec (ver o início do módulo); rng faz suas escolhas aleatórias."""
+    if spec == 'human':
+        from player import HumanPlayer
+
+        return HumanPlayer(name, pieces)
+    if spec == 'ai':
+        from player import AIPlayer
+
+        return AIPlayer(name, pieces, difficulty=difficulty, rng=rng)
+    if spec == 'random':
+        from player import RandomPlayer
+
+        return RandomPlayer(name, pieces, rng=rng)
+    if spec == 'greedy':
+        from player import GreedyPlayer
+
+        return GreedyPlayer(name, pieces, rng=rng)
+    from simulate import player_factory
+
+    return player_factory(spec)(name, pieces, rng=rng)
+
+def player_names(specs):
+    """Nomes dos jogadores: 'Jogador' e 'Computador', ou a própria descrição; repetidos ganham o número do lugar."""
+    names = [PLAYER_NAMES.get(spec.split(':')[0], spec) for spec in specs]
+    if names[0] == names[1]:
+        names = [f"{name} {seat + 1}" for seat, name in enumerate(names)]
+    return names
+
+def play_game(args, seed, difficulty, verbose, pause):
+    """Joga uma partida com a configuração da linha de comando e retorna DominoGame.result()."""
+    import random
+
+    from game import DominoGame
+    from utils import generate_domino_set, hand_size, shuffle_and_distribute
+
+    rng = random.Random(seed)  # distribuição e escolhas aleatórias dos jogadores
+    pieces = args.pieces if args.pieces is not None else hand_size(args.max_dots)
+    hands, stock = shuffle_and_distribute(generate_domino_set(args.max_dots), pieces_per_player=pieces, rng=rng)
+
+    specs = (args.player1, args.player2)
+    players = [create_player(spec, name, hand, difficulty, rng)
+               for spec, name, hand in zip(specs, player_names(specs), hands)]
+    game = DominoGame(players, stock, verbose=verbose, interactive=pause, draw_rule=args.draw_rule)
+    result = game.start()
+    result['seed'] = seed
+    return result
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Jogo de dominó no terminal, contra a IA ou entre jogadores automáticos.")
+    parser.add_argument('-1', '--player1', default='human', metavar='SPEC',
+                        help="primeiro jogador: human, random, greedy, ai ou ai:N[:perfect...] (padrão: human)")
+    parser.add_argument('-2', '--player2', default='ai', metavar='SPEC', help="segundo jogador (padrão: ai)")
+    parser.add_argument('-d', '--difficulty', type=int, choices=(1, 2, 3),
+                        help="dificuldade dos jogadores 'ai' (sem ela, é perguntada se houver humano; senão 2)")
+    parser.add_argument('-n', '--games', type=int, default=1, help="número de partidas (padrão: 1)")
+    parser.add_argument('--seed', type=int, help="semente da primeira partida; as seguintes usam seed+1, ...")
+    parser.add_argument('--max-dots', type=int, default=6, help="conjunto duplo-N (6, 9 ou 12)")
+    parser.add_argument('--pieces', type=int, help="peças por jogador (padrão: conforme o conjunto)")
+    parser.add_argument('--draw-rule', choices=DRAW_RULES, default='one', help="regra de compra (padrão: one)")
+    parser.add_argument('--format', choices=('text', 'json'), default='text',
+                        help="text narra a partida; json escreve uma linha JSON por partida")
+    parser.add_argument('-q', '--quiet', action='store_true', help="não narra as partidas, só os resultados")
+    parser.add_argument('--no-pause', action='store_true', help="não espera Enter entre os turnos")
+    args = parser.parse_args(argv)
+
+    if 'human' in (args.player1, args.player2) and (args.format == 'json' or args.games != 1):
+        parser.error("partidas com jogador humano são uma de cada vez e no formato text")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    human = 'human' in (args.player1, args.player2)
+    if args.format == 'text' and not args.quiet:
+        print(f"\n{Color.MAGENTA}===== JOGO DE DOMINÓ ====={Color.RESET}\n")
+        if human:
+            print(f"{Color.CYAN}Bem-vindo ao jogo de dominó no terminal!{Color.RESET}")
+
     # Obtém a dificuldade da IA
-    difficulty = get_difficulty_choice()
-    
-    # Gera e distribui as peças de dominó
-    dominoes = generate_domino_set()
-    hands, stock = shuffle_and_distribute(dominoes)
-    
-    # Cria os jogadores
-    human_player = HumanPlayer("Jogador", hands[0])
-    ai_player = AIPlayer("Computador", hands[1], difficulty=difficulty)
-    
-    # Cria e inicia o jogo
-    game = DominoGame(human_player, ai_player, stock)
-    game.start()
-    
-    print(f"\n{Color.GREEN}Obrigado por jogar!{Color.RESET}")
+    difficulty = args.difficulty
+    if difficulty is None:
+        difficulty = get_difficulty_choice() if human and 'ai' in (args.player1, args.player2) else 2
+
+    # Narra a partida só se for uma, e sem pausas quando ninguém precisa ler
+    verbose = args.format == 'text' and not args.quiet and args.games == 1
+    pause = human and not args.no_pause
+    wins = {}
+    for game_number in range(args.games):
+        seed = args.seed + game_number if args.seed is not None else None
+        result = play_game(args, seed, difficulty, verbose, pause)
+        wins[result['winner_name']] = wins.get(result['winner_name'], 0) + 1
+        if args.format == 'json':
+            import json
+
+            print(json.dumps(result), flush=True)
+        elif not verbose:
+            print(f"Partida {game_number + 1}: {result['winner_name']} venceu ({result['reason']}, "
+                  f"{result['turns']} turnos)")
+
+    if args.format == 'text':
+        if args.games > 1:
+            print(f"\nVitórias: " + ", ".join(f"{name}: {count}" for name, count in sorted(wins.items(), key=str)))
+        if human:
+            print(f"\n{Color.GREEN}Obrigado por jogar!{Color.RESET}")
+    return 0
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         print(f"\n{Color.YELLOW}Jogo encerrado pelo usuário. Até logo!{Color.RESET}")
     except Exception as e:
@@ -0,0 +1,467 @@
+import random
+import time
+
+import bitboard
+from ai import (TILE_ORDER_SCORE, ZOBRIST_ENDS, DifficultyLevel, SearchBudget, SearchTimeout, TranspositionTable,
+                eval_weights, get_search_depth, tile_weights)
+from bitboard import TILE_VALUE
+
+# Busca para mesas de N jogadores, com ou sem times (ver DominoGame).
+#
+# A posição é a lista de máscaras das mãos (uma por lugar), as extremidades, o
+# lugar de quem joga e o número de passes seguidos. As jogadas alteram a lista
+# no lugar e a restauram na volta, como em inplace.py. Dois algoritmos:
+#
+# - 'paranoid': o time do jogador raiz maximiza e todos os outros lugares
+#   minimizam o mesmo valor. Com dois times (duplas) é exatamente o minimax do
+#   jogo, e a poda alfa-beta e a tabela de transposição valem como no caso de
+#   dois jogadores.
+# - 'maxn': cada lugar maximiza o componente do seu próprio time em um vetor de
+#   valores (um por time). Não supõe coalizão dos adversários, mas só admite
+#   a poda imediata (parar quando o time de quem joga já venceu).
+#
+# A avaliação é por time: pontos e peças (ai.EvalWeights, termos value, count,
+# double e high_value) somados sobre as mãos de cada time, incrementalmente.
+# A busca não compra do monte: quem não tem jogada passa, e a mesa trava
+# quando todos passam seguidamente. Como o valor depende do time do ponto de
+# vista, cada jogador usa a sua própria tabela de transposição (ver AIPlayer).
+
+ALGORITHMS = ('paranoid', 'maxn')
+MAX_SEATS = 8
+WIN_SCORE = 1000  # valor de uma partida ganha, acima de qualquer avaliação heurística
+
+_zobrist_rng = random.Random(0x7AB1E)
+ZOBRIST_SEAT_TILES = [[_zobrist_rng.getrandbits(64) for _ in range(bitboard.TILE_COUNT)] for _ in range(MAX_SEATS)]
+ZOBRIST_MOVER = [_zobrist_rng.getrandbits(64) for _ in range(MAX_SEATS)]
+ZOBRIST_PASSES = [_zobrist_rng.getrandbits(64) for _ in range(MAX_SEATS + 1)]
+
+def _ends_hash(ends):
+    left = 0 if ends[0] is None else ends[0] + 1
+    right = 0 if ends[1] is None else ends[1] + 1
+    return ZOBRIST_ENDS[0][left] ^ ZOBRIST_ENDS[1][right]
+
+def table_hash(ends, masks, mover, passes=0):
+    """Hash de Zobrist de uma posição de N jogadores."""
+    key = _ends_hash(ends) ^ ZOBRIST_MOVER[mover] ^ ZOBRIST_PASSES[passes]
+    for seat, mask in enumerate(masks):
+        for idx in bitboard.iter_tiles(mask):
+            key ^= ZOBRIST_SEAT_TILES[seat][idx]
+    return key
+
+def _order_key(move):
+    return TILE_ORDER_SCORE[move[0]]
+
+class TableSearch:
+    """
+    Busca alfa-beta paranoica (ou max^n) para uma mesa de N jogadores.
+
+    teams dá o time de cada lugar e root_seat o lugar do jogador raiz, de cujo
+    time são os valores retornados. Uma TranspositionTable pode ser
+    reaproveitada entre buscas do mesmo jogador; um SearchStats recebe os
+    contadores.
+
+    No modo fácil, como em ai.negamax, o jogador raiz considera só metade das
+    suas jogadas (sorteadas com rng) e não há poda alfa-beta nem tabela de
+    transposição.
+    """
+
+    def __init__(self, teams, root_seat, difficulty, table=None, stats=None, weights=None, algorithm='paranoid',
+                 rng=random):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Algoritmo desconhecido: {algorithm}")
+        if len(teams) > MAX_SEATS:
+            raise ValueError(f"No máximo {MAX_SEATS} jogadores")
+        self.teams = list(teams)
+        self.seats = len(teams)
+        self.root_seat = root_seat
+        self.root_team = teams[root_seat]
+        self.difficulty = difficulty
+        self.easy = difficulty == DifficultyLevel.EASY
+        self.table = None if self.easy else table
+        self.rng = rng
+        self.stats = stats
+        self.algorithm = algorithm
+        self.budget = None
+
+        # Índice de cada time no vetor de valores e tamanho de cada time
+        self.team_ids = sorted(set(self.teams), key=self.teams.index)
+        self.team_index = [self.team_ids.index(team) for team in self.teams]
+        self.team_sizes = [self.teams.count(team) for team in self.team_ids]
+        self.root_index = self.team_ids.index(self.root_team)
+        if len(self.team_ids) < 2:
+            raise ValueError("A mesa precisa de ao menos dois times")
+
+        root_weights, other_weights = tile_weights(eval_weights(difficulty, weights))
+        if algorithm == 'paranoid':
+            # Os termos de duplas e peças altas valem para o time do jogador raiz
+            self.tile_weights = [root_weights if team == self.root_team else other_weights for team in self.teams]
+        else:
+            self.tile_weights = [other_weights] * self.seats
+        self.material = [0] * len(self.team_ids)
+
+    def _reset(self, masks):
+        self.material = [0] * len(self.team_ids)
+        for seat, mask in enumerate(masks):
+            weights = self.tile_weights[seat]
+            for idx in bitboard.iter_tiles(mask):
+                self.material[self.team_index[seat]] += weights[idx]
+
+    def _winning_team(self, masks):
+        """Índice do time que vence o jogo travado: menos pontos somados (empate: o que senta antes)."""
+        totals = [0] * len(self.team_ids)
+        for seat, mask in enumerate(masks):
+            totals[self.team_index[seat]] += sum(TILE_VALUE[idx] for idx in bitboard.iter_tiles(mask))
+        return min(range(len(totals)), key=lambda i: totals[i])
+
+    def _heuristic(self):
+        """Valor heurístico do ponto de vista do time raiz: material médio dos adversários menos o do time."""
+        material, sizes, root = self.material, self.team_sizes, self.root_index
+        others = sum(material) - material[root]
+        other_size = self.seats - sizes[root]
+        return (others * sizes[root] - material[root] * other_size) / (sizes[root] * other_size)
+
+    def _heuristic_vector(self):
+        total, material, sizes = sum(self.material), self.material, self.team_sizes
+        return tuple((total - material[i]) / (self.seats - sizes[i]) - material[i] / sizes[i]
+                     for i in range(len(material)))
+
+    def _outcome_vector(self, winner, depth):
+        score = WIN_SCORE + depth  # vencer antes vale mais
+        return tuple(score if i == winner else -score for i in range(len(self.team_ids)))
+
+    def _tick(self):
+        if self.budget is not None:
+            self.budget.tick()
+        if self.stats is not None:
+            self.stats.nodes += 1
+
+    def _paranoid(self, ends, masks, mover, passes, depth, alpha, beta, key):
+        """Valor (do ponto de vista do time raiz) da posição com mover na vez."""
+        self._tick()
+        stats = self.stats
+        if passes == self.seats:
+            return WIN_SCORE if self._winning_team(masks) == self.root_index else -WIN_SCORE
+        if depth == 0:
+            if stats is not None:
+                stats.leaf_nodes += 1
+            return self._heuristic()
+
+        table = self.table
+        hash_move = None
+        if table is not None:
+            entry = table.probe(key)
+            if entry is not None:
+                if stats is not None:
+                    stats.tt_hits += 1
+                _, entry_depth, score, flag, hash_move, _ = entry
+                if entry_depth >= depth:
+                    if flag == TranspositionTable.EXACT:
+                        return score
+                    if flag == TranspositionTable.LOWER and score >= beta:
+                        return score
+                    if flag == TranspositionTable.UPPER and score <= alpha:
+                        return score
+
+        next_seat = (mover + 1) % self.seats
+        mover_key = ZOBRIST_MOVER[mover] ^ ZOBRIST_MOVER[next_seat]
+        moves = bitboard.get_valid_moves(masks[mover], ends)
+        if not moves:
+            if stats is not None:
+                stats.pass_nodes += 1
+            return self._paranoid(ends, masks, next_seat, passes + 1, depth - 1, alpha, beta,
+                                  key ^ mover_key ^ ZOBRIST_PASSES[passes] ^ ZOBRIST_PASSES[passes + 1])
+        if stats is not None:
+            stats.expanded_nodes += 1
+            stats.moves_generated += len(moves)
+        if self.easy and mover == self.root_seat:
+            moves = self.rng.sample(moves, max(1, len(moves) // 2))
+        moves.sort(key=_order_key, reverse=True)
+        if hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+
+        maximizing = self.teams[mover] == self.root_team
+        team = self.team_index[mover]
+        weights = self.tile_weights[mover]
+        zobrist_tiles = ZOBRIST_SEAT_TILES[mover]
+        child_base = key ^ mover_key ^ ZOBRIST_PASSES[passes] ^ ZOBRIST_PASSES[0] ^ _ends_hash(ends)
+        alpha_orig, beta_orig = alpha, beta
+        mask = masks[mover]
+        best = float('-inf') if maximizing else float('inf')
+        best_move = None
+
+        for idx, side in moves:
+            new_mask, new_ends = bitboard.apply_move(mask, idx, side, ends)
+            if not new_mask:
+                # Dominó: a partida acaba com a vitória do time de quem jogou
+                score = WIN_SCORE + depth if maximizing else -WIN_SCORE - depth
+            else:
+                masks[mover] = new_mask
+                self.material[team] -= weights[idx]
+                score = self._paranoid(new_ends, masks, next_seat, 0, depth - 1, alpha, beta,
+                                       child_base ^ zobrist_tiles[idx] ^ _ends_hash(new_ends))
+                self.material[team] += weights[idx]
+                masks[mover] = mask
+
+            if maximizing:
+                if score > best:
+                    best, best_move = score, (idx, side)
+                    alpha = max(alpha, score)
+            elif score < best:
+                best, best_move = score, (idx, side)
+                beta = min(beta, score)
+            if alpha >= beta and not self.easy:  # Sem poda no modo fácil
+                if stats is not None:
+                    stats.cutoffs += 1
+                break
+
+        if table is not None:
+            if best <= alpha_orig:
+                flag = TranspositionTable.UPPER
+            elif best >= beta_orig:
+                flag = TranspositionTable.LOWER
+            else:
+                flag = TranspositionTable.EXACT
+            table.store(key, depth, best, flag, best_move)
+        return best
+
+    def _maxn(self, ends, masks, mover, passes, depth, key):
+        """Vetor de valores (um por time) da posição com mover na vez."""
+        self._tick()
+        stats = self.stats
+        if passes == self.seats:
+            return self._outcome_vector(self._winning_team(masks), 0)
+        if depth == 0:
+            if stats is not None:
+                stats.leaf_nodes += 1
+            return self._heuristic_vector()
+
+        table = self.table
+        hash_move = None
+        if table is not None:
+            entry = table.probe(key)
+            if entry is not None:
+                if stats is not None:
+                    stats.tt_hits += 1
+                _, entry_depth, vector, _, hash_move, _ = entry
+                if entry_depth >= depth:
+                    return vector
+
+        next_seat = (mover + 1) % self.seats
+        mover_key = ZOBRIST_MOVER[mover] ^ ZOBRIST_MOVER[next_seat]
+        moves = bitboard.get_valid_moves(masks[mover], ends)
+        if not moves:
+            if stats is not None:
+                stats.pass_nodes += 1
+            return self._maxn(ends, masks, next_seat, passes + 1, depth - 1,
+                              key ^ mover_key ^ ZOBRIST_PASSES[passes] ^ ZOBRIST_PASSES[passes + 1])
+        if stats is not None:
+            stats.expanded_nodes += 1
+            stats.moves_generated += len(moves)
+        if self.easy and mover == self.root_seat:
+            moves = self.rng.sample(moves, max(1, len(moves) // 2))
+        moves.sort(key=_order_key, reverse=True)
+        if hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+
+        team = self.team_index[mover]
+        weights = self.tile_weights[mover]
+        zobrist_tiles = ZOBRIST_SEAT_TILES[mover]
+        child_base = key ^ mover_key ^ ZOBRIST_PASSES[passes] ^ ZOBRIST_PASSES[0] ^ _ends_hash(ends)
+        mask = masks[mover]
+        best, best_move = None, None
+
+        for idx, side in moves:
+            new_mask, new_ends = bitboard.apply_move(mask, idx, side, ends)
+            if not new_mask:
+                vector = self._outcome_vector(team, depth)
+            else:
+                masks[mover] = new_mask
+                self.material[team] -= weights[idx]
+                vector = self._maxn(new_ends, masks, next_seat, 0, depth - 1,
+                                    child_base ^ zobrist_tiles[idx] ^ _ends_hash(new_ends))
+                self.material[team] += weights[idx]
+                masks[mover] = mask
+            if best is None or vector[team] > best[team]:
+                best, best_move = vector, (idx, side)
+                if vector[team] >= WIN_SCORE:  # poda imediata: não há nada melhor que vencer
+                    if stats is not None:
+                        stats.cutoffs += 1
+                    break
+
+        if table is not None:
+            table.store(key, depth, best, TranspositionTable.EXACT, best_move)
+        return best
+
+    def score_moves(self, ends, masks, mover, depth, moves=None, budget=None):
+        """
+        Retorna o valor exato de cada jogada de mover (o jogador raiz), como lista
+        de ((índice, lado), valor), com janela completa para que os valores possam
+        ser somados entre determinizações.
+        """
+        masks = list(masks)
+        self.budget = budget
+        self._reset(masks)
+        if moves is None:
+            moves = bitboard.get_valid_moves(masks[mover], ends)
+        team = self.team_index[mover]
+        weights = self.tile_weights[mover]
+        next_seat = (mover + 1) % self.seats
+        key = table_hash(ends, masks, mover) if self.table is not None else 0
+        base = key ^ ZOBRIST_MOVER[mover] ^ ZOBRIST_MOVER[next_seat] ^ _ends_hash(ends)
+        mask = masks[mover]
+
+        scores = []
+        for idx, side in moves:
+            new_mask, new_ends = bitboard.apply_move(mask, idx, side, ends)
+            if not new_mask:
+                score = WIN_SCORE + depth
+            else:
+                masks[mover] = new_mask
+                self.material[team] -= weights[idx]
+                child_key = base ^ ZOBRIST_SEAT_TILES[mover][idx] ^ _ends_hash(new_ends)
+                if self.algorithm == 'paranoid':
+                    score = self._paranoid(new_ends, masks, next_seat, 0, depth - 1, float('-inf'), float('inf'),
+                                           child_key)
+                else:
+                    score = self._maxn(new_ends, masks, next_seat, 0, depth - 1, child_key)[team]
+                self.material[team] += weights[idx]
+                masks[mover] = mask
+            scores.append(((idx, side), score))
+        return scores
+
+def table_voids(game):
+    """
+    Para cada lugar, a máscara das peças que ele comprovadamente não tem.
+
+    Quem passa mostra que não tem nenhuma peça com os números das extremidades;
+    como uma compra posterior pode trazer esses números, a restrição de um
+    jogador é esquecida quando ele compra.
+    """
+    voids = [0] * len(game.players)
+    for event in game.history:
+        if event[0] == 'pass':
+            ends = event[2]
+            if ends[0] is not None:
+                voids[event[1]] |= bitboard.PIP_MASKS[ends[0]] | bitboard.PIP_MASKS[ends[1]]
+        elif event[0] == 'draw':
+            voids[event[1]] = 0
+    return voids
+
+def sample_table_hands(game, seat, rng=random, attempts=20):
+    """
+    Sorteia as mãos dos outros lugares a partir do que o jogador do lugar seat
+    sabe: as peças fora da sua mão e do tabuleiro, o número de peças de cada
+    mão e as restrições de table_voids. Retorna a lista de máscaras (a do
+    próprio jogador é a verdadeira). Se as restrições não couberem em attempts
+    sorteios, elas são ignoradas.
+    """
+    players = game.players
+    own_mask = players[seat].hand_mask
+    full_mask = bitboard.pieces_to_mask(game.board) | bitboard.pieces_to_mask(game.stock)
+    for player in players:
+        full_mask |= player.hand_mask
+    unknown = full_mask & ~own_mask & ~bitboard.pieces_to_mask(game.board)
+    others = [other for other in range(len(players)) if other != seat]
+    voids = table_voids(game)
+
+    for attempt in range(attempts + 1):
+        if attempt == attempts:
+            voids = [0] * len(players)
+        remaining = [len(player.pieces) for player in players]
+        stock_left = len(game.stock)
+        masks = [0] * len(players)
+        masks[seat] = own_mask
+        tiles = list(bitboard.iter_tiles(unknown))
+        rng.shuffle(tiles)
+        # As peças que menos lugares podem ter são distribuídas primeiro
+        tiles.sort(key=lambda idx: sum(1 for other in others if not voids[other] >> idx & 1))
+        for idx in tiles:
+            options = [other for other in others if remaining[other] and not voids[other] >> idx & 1]
+            total = sum(remaining[other] for other in options) + stock_left
+            if not total:
+                break
+            pick = rng.randrange(total)
+            for other in options:
+                if pick < remaining[other]:
+                    masks[other] |= 1 << idx
+                    remaining[other] -= 1
+                    break
+                pick -= remaining[other]
+            else:
+                stock_left -= 1
+        else:
+            return masks
+    raise AssertionError("distribuição sem restrições sempre é possível")
+
+def find_best_move_table(game, player, difficulty=DifficultyLevel.MEDIUM, samples=16, perfect_information=False,
+                         time_limit=None, table=None, stats=None, weights=None, algorithm='paranoid', rng=random):
+    """
+    Escolhe a jogada de player em uma mesa de N jogadores.
+
+    Com perfect_information a busca vê as mãos verdadeiras; senão, soma os
+    valores de cada jogada sobre samples distribuições de sample_table_hands.
+    Com time_limit (segundos), a busca com informação perfeita aprofunda
+    iterativamente até o tempo acabar, e as amostras que não couberem no tempo
+    são descartadas (ao menos uma é sempre concluída). Retorna (peça, lado) ou
+    None se não houver jogada.
+    """
+    start = time.perf_counter()
+    seat = game.players.index(player)
+    moves = bitboard.get_valid_moves(player.hand_mask, game.ends)
+    if not moves:
+        return None
+    if difficulty == DifficultyLevel.EASY:
+        # Para dificuldade fácil, ignora algumas jogadas aleatoriamente para decisões subótimas
+        moves = rng.sample(moves, max(1, len(moves) // 2))
+    moves.sort(key=_order_key, reverse=True)
+
+    depth = get_search_depth(difficulty)
+    teams = game.teams if game.teams is not None else list(range(len(game.players)))
+    search = TableSearch(teams, seat, difficulty, table, stats, weights, algorithm, rng)
+    if search.table is not None:
+        search.table.new_search()
+
+    if len(moves) == 1:
+        best, score = moves[0], None
+    elif perfect_information:
+        masks = [p.hand_mask for p in game.players]
+        budget = SearchBudget(time_limit) if time_limit is not None else None
+        best, score = moves[0], None
+        max_depth = depth if time_limit is None else sum(bin(mask).count('1') for mask in masks) + len(masks)
+        for iteration_depth in range(depth if time_limit is None else 1, max_depth + 1):
+            try:
+                scores = search.score_moves(game.ends, masks, seat, iteration_depth, moves,
+                                            budget if score is not None else None)
+            except SearchTimeout:
+                break
+            best, score = max(scores, key=lambda entry: entry[1])
+            depth = iteration_depth
+            # A melhor jogada abre a próxima iteração
+            moves.remove(best)
+            moves.insert(0, best)
+    else:
+        totals = dict.fromkeys(moves, 0)
+        budget = SearchBudget(time_limit) if time_limit is not None else None
+        for sample in range(samples):
+            masks = sample_table_hands(game, seat, rng)
+            try:
+                scores = search.score_moves(game.ends, masks, seat, depth, moves, budget if sample else None)
+            except SearchTimeout:
+                break
+            for move, value in scores:
+                totals[move] += value
+        # Em caso de empate prevalece a ordem de moves
+        best = max(moves, key=lambda move: totals[move])
+        score = totals[best]
+
+    if stats is not None:
+        stats.seconds = time.perf_counter() - start
+        stats.depth = depth
+        stats.score = score
+        stats.move = best
+    idx, side = best
+    for piece in player.pieces:
+        if piece.index == idx:
+            return piece, side
@@ -0,0 +1,120 @@
+import multiprocessing
+
+import bitboard
+from ai import EvalAggregates, MoveOrdering, TranspositionTable, negamax, order_moves, score_root_moves
+
+# Busca paralela na raiz: cada jogada da raiz (ou cada mão sorteada, na busca por
+# determinização) vira uma tarefa de um pool persistente de processos. O melhor
+# valor já encontrado na raiz é compartilhado entre os processos e serve de
+# limite alfa para as tarefas que começam depois.
+
+_shared_alpha = None
+_worker_tables = {}
+
+def _init_worker(shared_alpha):
+    """Inicializa um processo do pool com o alfa compartilhado."""
+    global _shared_alpha
+    _shared_alpha = shared_alpha
+
+def _worker_table(difficulty, weights=None):
+    """Tabela de transposição do processo, mantida entre tarefas (uma por dificuldade e pesos)."""
+    table = _worker_tables.get((difficulty, weights))
+    if table is None:
+        table = _worker_tables[(difficulty, weights)] = TranspositionTable()
+    return table
+
+def _search_root_move(task):
+    """Busca uma jogada da raiz. Retorna (posição na ordem, valor, exato?)."""
+    position, (idx, side), ends, player_mask, opponent_mask, depth, difficulty, weights = task
+    with _shared_alpha.get_lock():
+        alpha = _shared_alpha.value
+    # Janela (alpha - 1, inf): valores iguais ao melhor atual ainda saem exatos,
+    # para que o desempate por ordem não dependa do escalonamento
+    bound = alpha - 1
+    table = _worker_table(difficulty, weights)
+    table.new_search()
+
+    new_mask, new_ends = bitboard.apply_move(player_mask, idx, side, ends)
+    score, _ = negamax(new_ends, opponent_mask, new_mask, depth - 1, float('-inf'), -bound, -1,
+                       difficulty, table, ordering=MoveOrdering(),
+                       aggregates=EvalAggregates(new_mask, opponent_mask, difficulty, weights))
+    score = -score
+    exact = score > bound
+    if exact:
+        with _shared_alpha.get_lock():
+            if score > _shared_alpha.value:
+                _shared_alpha.value = score
+    return position, score, exact
+
+def _score_sample(task):
+    """Pontua as jogadas da raiz para uma mão sorteada do oponente."""
+    position, ends, player_mask, opponent_mask, depth, difficulty, moves, weights = task
+    table = _worker_table(difficulty, weights)
+    table.new_search()
+    scores = score_root_moves(ends, player_mask, opponent_mask, depth, difficulty, table,
+                              ordering=MoveOrdering(), moves=moves, weights=weights)
+    return position, scores
+
+class SearchPool:
+    """
+    Pool persistente de processos para buscar a raiz em paralelo.
+
+    Deve ser criado uma vez e reaproveitado entre jogadas e partidas; use close()
+    (ou um bloco with) para encerrar os processos. O resultado não depende da
+    ordem em que os processos terminam: empates são decididos pela ordem das
+    jogadas.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self._alpha = multiprocessing.Value('d', float('-inf'))
+        self._pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(self._alpha,))
+
+    def search_root(self, ends, player_mask, opponent_mask, depth, difficulty, weights=None):
+        """Equivalente paralelo de ai.search_root. Retorna (valor, jogada)."""
+        moves = bitboard.get_valid_moves(player_mask, ends)
+        if not moves:
+            return negamax(ends, player_mask, opponent_mask, depth, float('-inf'), float('inf'), 1,
+                           difficulty, aggregates=EvalAggregates(player_mask, opponent_mask, difficulty, weights))
+        order_moves(moves, depth)
+
+        with self._alpha.get_lock():
+            self._alpha.value = float('-inf')
+        tasks = [(i, move, ends, player_mask, opponent_mask, depth, difficulty, weights)
+                 for i, move in enumerate(moves)]
+
+        best_score, best_position = float('-inf'), None
+        for position, score, exact in self._pool.imap_unordered(_search_root_move, tasks):
+            if not exact:
+                continue
+            if score > best_score or (score == best_score and position < best_position):
+                best_score, best_position = score, position
+        return best_score, moves[best_position]
+
+    def score_samples(self, ends, player_mask, weighted_hands, depth, difficulty, moves, weights=None):
+        """
+        Soma, para cada jogada, os valores obtidos em cada mão sorteada do oponente.
+
+        weighted_hands é a lista de (máscara, peso) de sample_opponent_hands.
+        Retorna um dicionário jogada -> total.
+        """
+        tasks = [(i, ends, player_mask, hand, depth, difficulty, moves, weights)
+                 for i, (hand, _) in enumerate(weighted_hands)]
+        totals = dict.fromkeys(moves, 0)
+        # Soma na ordem das amostras, para o resultado ser sempre o mesmo
+        for position, scores in sorted(self._pool.imap_unordered(_score_sample, tasks)):
+            weight = weighted_hands[position][1]
+            for move, score in scores:
+                totals[move] += score * weight
+        return totals
+
+    def close(self):
+        """Encerra os processos do pool."""
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
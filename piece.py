@@ -1,35 +1,80 @@
 class DominoPiece:
-    """Representa uma peça de dominó com valores esquerdo e direito."""
-    
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-    
+    """
+    Representa uma peça de dominó com valores esquerdo e direito.
+
+    As peças são imutáveis e únicas: DominoPiece(a, b) sempre retorna a mesma
+    instância para a mesma orientação (a, b), e as duas orientações de uma peça
+    ficam ligadas entre si, de modo que flipped() não cria objetos. Os atributos
+    index (índice canônico, ver bitboard.tile_index), bit, value e double são
+    calculados uma única vez.
+    """
+
+    __slots__ = ('left', 'right', 'index', 'bit', 'value', 'double', '_flipped')
+
+    _registry = {}
+
+    def __new__(cls, left, right):
+        piece = cls._registry.get((left, right))
+        if piece is not None:
+            return piece
+
+        piece = object.__new__(cls)
+        low, high = (left, right) if left <= right else (right, left)
+        index = high * (high + 1) // 2 + low
+        set_attr = object.__setattr__
+        set_attr(piece, 'left', left)
+        set_attr(piece, 'right', right)
+        set_attr(piece, 'index', index)
+        set_attr(piece, 'bit', 1 << index)
+        set_attr(piece, 'value', left + right)
+        set_attr(piece, 'double', left == right)
+        cls._registry[(left, right)] = piece
+
+        if left == right:
+            set_attr(piece, '_flipped', piece)
+        else:
+            other = cls(right, left)
+            set_attr(piece, '_flipped', other)
+            set_attr(other, '_flipped', piece)
+        return piece
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DominoPiece é imutável")
+
+    def __delattr__(self, name):
+        raise AttributeError("DominoPiece é imutável")
+
+    def __reduce__(self):
+        # Ao ser copiada ou enviada a outro processo, a peça volta a ser a instância única
+        return DominoPiece, (self.left, self.right)
+
     def flipped(self):
-        """Retorna uma nova peça com os valores invertidos."""
-        return DominoPiece(self.right, self.left)
-    
+        """Retorna a peça com os valores invertidos."""
+        return self._flipped
+
     def matches(self, number):
         """Verifica se a peça combina com um número fornecido."""
         if number is None:  # A primeira peça pode ser qualquer uma
             return True
         return self.left == number or self.right == number
-    
+
     def is_double(self):
         """Verifica se a peça é uma dupla (mesmo valor nos dois lados)."""
-        return self.left == self.right
-    
+        return self.double
+
     def get_value(self):
         """Retorna o valor total da peça."""
-        return self.left + self.right
-    
+        return self.value
+
     def __eq__(self, other):
-        """Compara duas peças para ver se são iguais."""
+        """Compara duas peças para ver se são iguais (em qualquer orientação)."""
         if not isinstance(other, DominoPiece):
-            return False
-        return (self.left == other.left and self.right == other.right) or \
-               (self.left == other.right and self.right == other.left)
-    
+            return NotImplemented
+        return self.index == other.index
+
+    def __hash__(self):
+        return self.index
+
     def __repr__(self):
         """Representação em string da peça."""
         return f"[{self.left}|{self.right}]"
@@ -1,38 +1,52 @@
+import random
+
+import bitboard
 from piece import DominoPiece
 from colors import Color
 
 class Player:
-    """Classe base de jogador com funcionalidades comuns."""
+    """
+    Classe base de jogador com funcionalidades comuns.
+
+    Além da lista pieces, o jogador mantém hand_mask, a mão como máscara de bits
+    (ver bitboard.py); por isso a mão deve ser alterada com add_piece e
+    remove_piece. rng (um random.Random) faz as escolhas aleatórias do jogador;
+    sem ele, usa-se o módulo random.
+    """
     
-    def __init__(self, name, pieces):
+    def __init__(self, name, pieces, rng=None):
         self.name = name
         self.pieces = pieces
+        self.hand_mask = bitboard.pieces_to_mask(pieces)
+        self.rng = rng if rng is not None else random
     
     def has_valid_move(self, ends):
         """Verifica se o jogador tem jogadas válidas com as pontas atuais do tabuleiro."""
-        for piece in self.pieces:
-            if piece.matches(ends[0]) or piece.matches(ends[1]):
-                return True
-        return False
+        return bitboard.has_valid_move(self.hand_mask, ends)
     
     def remove_piece(self, piece):
         """Remove uma peça da mão do jogador."""
         for i, p in enumerate(self.pieces):
             if p == piece:
+                self.hand_mask &= ~p.bit
                 return self.pieces.pop(i)
         raise ValueError("Peça não encontrada na mão do jogador")
     
     def add_piece(self, piece):
         """Adiciona uma peça à mão do jogador."""
         self.pieces.append(piece)
+        self.hand_mask |= piece.bit
     
     def get_valid_moves(self, ends):
         """Retorna todas as jogadas válidas com base nas pontas atuais do tabuleiro."""
+        left_mask, right_mask = bitboard.playable_masks(self.hand_mask, ends)
         jogadas_validas = []
+        if not left_mask and not right_mask:
+            return jogadas_validas
         for i, piece in enumerate(self.pieces):
-            if piece.matches(ends[0]):
+            if left_mask & piece.bit:
                 jogadas_validas.append((i, piece, 'left'))
-            if piece.matches(ends[1]) and ends[0] != ends[1]:  # Evita duplicatas na primeira jogada
+            if right_mask & piece.bit:  # Evita duplicatas quando as pontas são iguais
                 jogadas_validas.append((i, piece, 'right'))
         return jogadas_validas
     
@@ -77,15 +91,126 @@ class HumanPlayer(Player):
             except (KeyboardInterrupt, EOFError):
                 raise KeyboardInterrupt("Jogo encerrado pelo usuário")
 
+class RandomPlayer(Player):
+    """Jogador automático que escolhe uma jogada válida ao acaso (referência para testes)."""
+    
+    def make_move(self, game):
+        """Escolhe uma jogada válida aleatória."""
+        jogadas_validas = self.get_valid_moves(game.ends)
+        if not jogadas_validas:
+            return None, None
+        _, piece, side = self.rng.choice(jogadas_validas)
+        return piece, side
+
+class GreedyPlayer(Player):
+    """Jogador automático que sempre joga a peça válida de maior valor."""
+    
+    def make_move(self, game):
+        """Escolhe a jogada válida com a peça de maior valor."""
+        jogadas_validas = self.get_valid_moves(game.ends)
+        if not jogadas_validas:
+            return None, None
+        _, piece, side = max(jogadas_validas, key=lambda jogada: jogada[1].get_value())
+        return piece, side
+
 class AIPlayer(Player):
-    """Jogador IA que utiliza o algoritmo minimax para escolher jogadas."""
+    """
+    Jogador IA que utiliza o algoritmo minimax para escolher jogadas.
+
+    Por padrão a IA só usa informação legal: a mão do oponente é estimada por
+    determinização (ver determinization.py) com samples mãos sorteadas. Com
+    perfect_information=True ela volta a enxergar a mão do oponente. Um
+    parallel.SearchPool opcional divide a busca entre processos.
+
+    Com collect_stats=True, last_stats guarda o ai.SearchStats da última jogada;
+    com trace (caminho de arquivo), cada decisão é gravada como uma linha JSON.
+    in_place=True usa a busca sem alocação por nó de inplace.py, e um
+    book.OpeningBook (que pode ser compartilhado entre jogadores) responde as
+    posições de abertura que estiverem nele sem busca. Um poscache.PositionCache
+    guarda as decisões em disco para outros processos e execuções. weights (um
+    ai.EvalWeights, por exemplo ajustado por tune.py) substitui os pesos padrão
+    da avaliação, ajustados ao conjunto de peças da partida (ver
+    ai.weights_for_set). Em mesas com mais de dois jogadores a jogada vem de
+    multiplayer.py, com o algoritmo algorithm ('paranoid' ou 'maxn').
+    """
     
-    def __init__(self, name, pieces, difficulty=2):
-        super().__init__(name, pieces)
+    def __init__(self, name, pieces, difficulty=2, time_limit=None, perfect_information=False, samples=16,
+                 pool=None, collect_stats=False, trace=None, in_place=False, book=None, cache=None, weights=None,
+                 algorithm='paranoid', rng=None):
+        super().__init__(name, pieces, rng)
         self.difficulty = difficulty
+        self.time_limit = time_limit  # segundos por jogada; None usa profundidade fixa
+        self.perfect_information = perfect_information
+        self.samples = samples
+        self.pool = pool
+        self.collect_stats = collect_stats or trace is not None
+        self.trace = trace
+        self.in_place = in_place
+        self.book = book
+        self.cache = cache
+        self.weights = weights
+        self.algorithm = algorithm
+        self._trace = None
+        self.last_stats = None
+        self.transposition_table = None
+        self.endgame_solver = None
+        self._table_game = None
+    
+    def _get_table(self, game):
+        """Retorna a tabela de transposição da partida, criando uma nova a cada jogo."""
+        from ai import TranspositionTable
+        from endgame import EndgameSolver
+        
+        if self.transposition_table is None or self._table_game is not game:
+            self.transposition_table = TranspositionTable()
+            self.endgame_solver = EndgameSolver()
+            self._table_game = game
+        return self.transposition_table
+    
+    def _get_solver(self, game):
+        """Retorna o solver de finais da partida (criado junto com a tabela)."""
+        self._get_table(game)
+        return self.endgame_solver
+    
+    def _game_weights(self, game, difficulty):
+        """Pesos da avaliação para o conjunto da partida; None se forem os padrão."""
+        from ai import DEFAULT_WEIGHTS, eval_weights, weights_for_set
+        
+        weights = weights_for_set(eval_weights(difficulty, self.weights), game.max_dots)
+        if self.weights is None and weights == DEFAULT_WEIGHTS[difficulty]:
+            return None
+        return weights
     
     def make_move(self, game):
         """Utiliza o algoritmo minimax para escolher a melhor jogada."""
+        if not self.collect_stats:
+            return self._choose_move(game, None)
+        
+        from ai import SearchStats, SearchTrace
+        
+        stats = SearchStats()
+        move = self._choose_move(game, stats)
+        self.last_stats = stats
+        if self.trace is not None:
+            if self._trace is None:
+                self._trace = SearchTrace(self.trace)
+            record = stats.record()
+            record.update({
+                'player': self.name,
+                'difficulty': self.difficulty,
+                'perfect_information': self.perfect_information,
+                'turn': game.turns,
+                'ends': list(game.ends),
+                'hand': [repr(p) for p in self.pieces],
+                'opponent_tiles': (len(game.get_opponent(self).pieces) if len(game.players) == 2 else
+                                   [len(p.pieces) for p in game.players if p is not self]),
+                'stock': len(game.stock),
+            })
+            self._trace.write(record)
+        return move
+    
+    def _choose_move(self, game, stats):
+        """Escolhe a jogada com o motor configurado, preenchendo stats se fornecido."""
         from ai import find_best_move, DifficultyLevel
         
         # Mapeia o nível de dificuldade
@@ -94,6 +219,55 @@ class AIPlayer(Player):
             2: DifficultyLevel.MEDIUM,
             3: DifficultyLevel.HARD
         }
+        weights = self._game_weights(game, mapa_dificuldade[self.difficulty])
+        
+        if len(game.players) > 2:
+            from multiplayer import find_best_move_table
+            
+            # Livro, cache e solver de finais são de partidas de dois jogadores
+            return find_best_move_table(
+                game,
+                self,
+                difficulty=mapa_dificuldade[self.difficulty],
+                samples=self.samples,
+                perfect_information=self.perfect_information,
+                time_limit=self.time_limit,
+                table=self._get_table(game),
+                stats=stats,
+                weights=weights,
+                algorithm=self.algorithm,
+                rng=self.rng
+            )
+        
+        if self.book is not None and self.difficulty != DifficultyLevel.EASY:
+            move = self.book.lookup(game.ends, self.pieces, game.board, game.max_dots)
+            if move is not None:
+                if stats is not None:
+                    stats.move = (move[0].index, move[1])
+                    stats.book = True
+                return move
+        
+        if not self.perfect_information:
+            from determinization import Belief, find_best_move_imperfect
+            
+            belief = Belief.from_game(game, self)
+            return find_best_move_imperfect(
+                game.ends,
+                self.pieces,
+                belief,
+                difficulty=mapa_dificuldade[self.difficulty],
+                samples=self.samples,
+                time_limit=self.time_limit,
+                pool=self.pool,
+                stats=stats,
+                solver=self._get_solver(game),
+                root_first=game.players[0] is self,
+                in_place=self.in_place,
+                cache=self.cache,
+                weights=weights,
+                table=self._get_table(game),
+                rng=self.rng
+            )
         
         # Obtém a melhor jogada usando minimax
         piece, side = find_best_move(
@@ -101,7 +275,18 @@ class AIPlayer(Player):
             game.ends, 
             self.pieces[:], 
             game.get_opponent(self).pieces[:], 
-            difficulty=mapa_dificuldade[self.difficulty]
+            difficulty=mapa_dificuldade[self.difficulty],
+            table=self._get_table(game),
+            time_limit=self.time_limit,
+            pool=self.pool,
+            stats=stats,
+            stock_size=len(game.stock),
+            solver=self._get_solver(game),
+            root_first=game.players[0] is self,
+            in_place=self.in_place,
+            cache=self.cache,
+            weights=weights,
+            rng=self.rng
         )
         
         return piece, side
@@ -0,0 +1,139 @@
+import os
+import sqlite3
+import time
+
+# Cache persistente de posições avaliadas, em um arquivo SQLite compartilhado
+# por processos e reinícios. Cada entrada liga a chave canônica de uma posição
+# (hash de Zobrist combinado com a variante da busca, ver mix_key) ao resultado
+# da busca: profundidade, valor e melhor jogada.
+#
+# O banco usa WAL: vários processos leem ao mesmo tempo sem bloquear, e as
+# escritas esperam a vez umas das outras (timeout). As consultas não escrevem;
+# o horário de uso das entradas encontradas é atualizado em lote, e a remoção
+# por idade e por tamanho (as menos usadas recentemente saem primeiro) roda a
+# cada EVICT_INTERVAL gravações.
+
+MASK64 = (1 << 64) - 1
+_FNV_PRIME = 0x100000001B3
+
+def mix_key(key, *values):
+    """Combina uma chave de 64 bits com inteiros (de qualquer tamanho) de forma determinística."""
+    for value in values:
+        while True:
+            key = ((key ^ (value & MASK64)) * _FNV_PRIME) & MASK64
+            value >>= 64
+            if not value:
+                break
+    return key
+
+def _signed(key):
+    """Converte uma chave de 64 bits sem sinal para o INTEGER (com sinal) do SQLite."""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+class PositionCache:
+    """
+    Cache de posições em disco: chave -> (profundidade, valor, jogada).
+
+    max_entries limita o número de entradas e max_age (segundos) descarta as que
+    não são usadas há mais tempo que isso. A conexão é aberta na primeira
+    operação e reaberta em processos filhos, de modo que um PositionCache pode
+    ser criado antes de um fork ou enviado a outros processos.
+    """
+    EVICT_INTERVAL = 1000  # gravações entre duas verificações de tamanho e idade
+    TOUCH_BATCH = 256      # usos acumulados antes de atualizar o horário de uso
+
+    def __init__(self, path, max_entries=1 << 20, max_age=None, timeout=30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+        self._touched = []
+        self._writes = 0
+
+    def _connection(self):
+        if self._conn is None or self._pid != os.getpid():
+            # Uma conexão SQLite não pode ser usada depois de um fork
+            self._conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._pid = os.getpid()
+            self._touched = []
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS positions ('
+                               'key INTEGER PRIMARY KEY, depth INTEGER, score REAL, move INTEGER, used REAL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS positions_used ON positions (used)')
+        return self._conn
+
+    def get(self, key, min_depth=0):
+        """
+        Retorna (profundidade, valor, jogada) da posição, ou None se ela não estiver
+        no cache ou tiver sido buscada com profundidade menor que min_depth. A
+        jogada é (índice da peça, lado) ou None.
+        """
+        row = self._connection().execute('SELECT depth, score, move FROM positions WHERE key = ?',
+                                         (_signed(key),)).fetchone()
+        if row is None or row[0] < min_depth:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append(_signed(key))
+        if len(self._touched) >= self.TOUCH_BATCH:
+            self.flush()
+        depth, score, code = row
+        move = None if code is None else (code >> 1, 'right' if code & 1 else 'left')
+        return depth, score, move
+
+    def put(self, key, depth, score, move):
+        """Guarda o resultado de uma busca; uma entrada só é substituída por outra de profundidade maior ou igual."""
+        code = None if move is None else move[0] * 2 + (move[1] == 'right')
+        self._connection().execute(
+            'INSERT INTO positions (key, depth, score, move, used) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET depth = excluded.depth, score = excluded.score, '
+            'move = excluded.move, used = excluded.used WHERE excluded.depth >= positions.depth',
+            (_signed(key), depth, score, code, time.time()))
+        self._writes += 1
+        if self._writes % self.EVICT_INTERVAL == 0:
+            self.evict()
+
+    def flush(self):
+        """Grava o horário de uso das entradas encontradas desde a última vez."""
+        if not self._touched:
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN')
+        conn.executemany('UPDATE positions SET used = ? WHERE key = ?', [(now, key) for key in self._touched])
+        conn.execute('COMMIT')
+        self._touched = []
+
+    def evict(self):
+        """Remove as entradas mais antigas que max_age e, acima de max_entries, as menos usadas."""
+        self.flush()
+        conn = self._connection()
+        if self.max_age is not None:
+            conn.execute('DELETE FROM positions WHERE used < ?', (time.time() - self.max_age,))
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            # Remove um pouco além do excesso, para não repetir a remoção a cada gravação
+            excess += self.max_entries // 10
+            conn.execute('DELETE FROM positions WHERE key IN '
+                         '(SELECT key FROM positions ORDER BY used LIMIT ?)', (excess,))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def close(self):
+        """Grava os usos pendentes e fecha a conexão."""
+        if self._conn is not None and self._pid == os.getpid():
+            self.flush()
+            self._conn.close()
+        self._conn = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_touched'] = []
+        return state
@@ -0,0 +1,294 @@
+import argparse
+import json
+import sys
+
+import bitboard
+from game import DRAW_RULES, DominoGame
+from piece import DominoPiece
+from player import Player
+
+# Registro binário compacto de partidas, para auditoria, análises e treino.
+#
+# Um arquivo é o cabeçalho FILE_HEADER seguido de registros, cada um precedido
+# pelo seu tamanho em bytes (varint), de modo que um leitor pode percorrer o
+# arquivo sem decodificar o que não usa. Um registro contém:
+#
+#   varint  semente + 1 (0: sem semente)
+#   byte    jogadores, byte peças por mão, byte peças no monte, byte regra de
+#           compra (índice em game.DRAW_RULES)
+#   byte    1 se a partida é por times (seguido de um byte com o time de cada
+#           lugar), 0 se não
+#   bytes   índices das peças (bitboard.tile_index) de cada mão, na ordem da
+#           distribuição, seguidos dos do monte (a compra tira a última)
+#   varint  número de eventos, e um byte por evento: jogada = índice da peça
+#           * 2 + lado (0 esquerda, 1 direita), DRAW ou PASS
+#   byte    vencedor (NO_WINNER se nenhum), byte motivo (REASONS), varint turnos
+#
+# Quem joga cada evento não é guardado: a partir da distribuição e das
+# jogadas, as compras e passes são consequência da regra de compra, e replay refaz a
+# partida e confere que os eventos e o resultado batem com o registro.
+
+FILE_HEADER = b'DOMR\x03'
+DRAW = 0xFE
+PASS = 0xFF
+NO_WINNER = 0xFF
+REASONS = (None, 'domino', 'blocked')
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, pos):
+    """Retorna (valor, posição seguinte); IndexError se o varint estiver incompleto."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def encode_event(event):
+    """Converte um evento de DominoGame.history no seu código de um byte."""
+    if event[0] == 'play':
+        return event[2].index * 2 + (event[3] == 'right')
+    return DRAW if event[0] == 'draw' else PASS
+
+class GameRecord:
+    """
+    Registro de uma partida: distribuição, eventos e resultado.
+
+    hands e stock são listas de índices de peças; events é um bytes com os
+    códigos de encode_event; teams é a lista de times de DominoGame ou None.
+    """
+    __slots__ = ('seed', 'hands', 'stock', 'draw_rule', 'events', 'winner', 'reason', 'turns', 'teams')
+
+    def __init__(self, seed, hands, stock, draw_rule='one', events=b'', winner=None, reason=None, turns=0,
+                 teams=None):
+        self.seed = seed
+        self.hands = hands
+        self.stock = stock
+        self.draw_rule = draw_rule
+        self.events = events
+        self.winner = winner
+        self.reason = reason
+        self.turns = turns
+        self.teams = teams
+
+    @classmethod
+    def from_deal(cls, hands, stock, seed=None):
+        """Cria o registro a partir das mãos e do monte, antes do início da partida."""
+        return cls(seed, [[piece.index for piece in hand] for hand in hands], [piece.index for piece in stock])
+
+    def finish(self, game):
+        """Completa o registro com os eventos e o resultado de uma partida encerrada."""
+        self.draw_rule = game.draw_rule
+        self.teams = list(game.teams) if game.teams is not None else None
+        self.events = bytes(encode_event(event) for event in game.history)
+        self.winner = game.players.index(game.winner) if game.winner is not None else None
+        self.reason = game.end_reason
+        self.turns = game.turns
+        return self
+
+    @property
+    def max_dots(self):
+        return max(bitboard.TILE_HIGH[idx] for hand in self.hands for idx in hand + self.stock)
+
+    def moves(self):
+        """Itera sobre os eventos decodificados: ('play', índice, lado), ('draw',) ou ('pass',)."""
+        for code in self.events:
+            if code == DRAW:
+                yield ('draw',)
+            elif code == PASS:
+                yield ('pass',)
+            else:
+                yield ('play', code >> 1, 'right' if code & 1 else 'left')
+
+    def encode(self):
+        """Retorna o registro serializado, já precedido pelo tamanho."""
+        payload = bytearray()
+        _write_varint(payload, 0 if self.seed is None else self.seed + 1)
+        payload += bytes((len(self.hands), len(self.hands[0]), len(self.stock), DRAW_RULES.index(self.draw_rule)))
+        if self.teams is None:
+            payload.append(0)
+        else:
+            payload.append(1)
+            payload += bytes(self.teams)
+        for hand in self.hands:
+            payload += bytes(hand)
+        payload += bytes(self.stock)
+        _write_varint(payload, len(self.events))
+        payload += self.events
+        payload += bytes((NO_WINNER if self.winner is None else self.winner, REASONS.index(self.reason)))
+        _write_varint(payload, self.turns)
+
+        out = bytearray()
+        _write_varint(out, len(payload))
+        return bytes(out + payload)
+
+    @classmethod
+    def decode(cls, payload):
+        """Reconstrói um registro a partir do conteúdo (sem o tamanho) gravado por encode."""
+        seed, pos = _read_varint(payload, 0)
+        players, hand_size, stock_size, draw_rule = payload[pos:pos + 4]
+        pos += 4
+        teams = None
+        if payload[pos]:
+            teams = list(payload[pos + 1:pos + 1 + players])
+            pos += players
+        pos += 1
+        hands = []
+        for _ in range(players):
+            hands.append(list(payload[pos:pos + hand_size]))
+            pos += hand_size
+        stock = list(payload[pos:pos + stock_size])
+        pos += stock_size
+        count, pos = _read_varint(payload, pos)
+        events = bytes(payload[pos:pos + count])
+        pos += count
+        winner, reason = payload[pos:pos + 2]
+        turns, _ = _read_varint(payload, pos + 2)
+        return cls(None if seed == 0 else seed - 1, hands, stock, DRAW_RULES[draw_rule], events,
+                   None if winner == NO_WINNER else winner, REASONS[reason], turns, teams)
+
+class RecordWriter:
+    """
+    Grava registros em sequência em um arquivo. Com append=True, acrescenta a um
+    arquivo existente. Pode ser usado como gerenciador de contexto.
+    """
+
+    def __init__(self, path, append=False):
+        self.count = 0
+        self._file = open(path, 'ab' if append else 'wb')
+        if self._file.tell() == 0:
+            self._file.write(FILE_HEADER)
+
+    def write(self, record):
+        """Grava um GameRecord ou um registro já serializado por GameRecord.encode."""
+        self._file.write(record if isinstance(record, bytes) else record.encode())
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_records(path, decode=True, chunk_size=1 << 20):
+    """
+    Itera sobre os registros de um arquivo, lendo-o em blocos de chunk_size
+    bytes: a memória usada não depende do tamanho do arquivo. Com decode=False,
+    retorna o conteúdo bruto de cada registro (ver GameRecord.decode).
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(FILE_HEADER)) != FILE_HEADER:
+            raise ValueError(f"{path} não é um arquivo de registros de partidas")
+        data, pos = b'', 0
+        while True:
+            try:
+                size, start = _read_varint(data, pos)
+                end = start + size
+                if end > len(data):
+                    raise IndexError
+            except IndexError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    if pos < len(data):
+                        raise ValueError(f"{path} termina com um registro incompleto")
+                    return
+                data, pos = data[pos:] + chunk, 0
+                continue
+            payload = data[start:end]
+            pos = end
+            yield GameRecord.decode(payload) if decode else payload
+
+def replay(record, names=None, verbose=False):
+    """
+    Refaz a partida do registro e retorna o DominoGame encerrado. Sem names,
+    os jogadores se chamam 'a', 'b', ... na ordem da mesa.
+
+    As jogadas vêm do registro; compras, passes e o resultado vêm das regras e
+    são conferidos com o registro. Levanta ValueError se não baterem.
+    """
+    def pieces(indices):
+        return [DominoPiece(bitboard.TILE_LOW[idx], bitboard.TILE_HIGH[idx]) for idx in indices]
+
+    if names is None:
+        names = [chr(ord('a') + seat) for seat in range(len(record.hands))]
+    players = [Player(name, pieces(hand)) for name, hand in zip(names, record.hands)]
+    game = DominoGame(players, pieces(record.stock), teams=record.teams, verbose=verbose, interactive=False,
+                      draw_rule=record.draw_rule)
+    plays = (code for code in record.events if code != DRAW and code != PASS)
+
+    game.begin()
+    next(plays, None)  # a peça inicial é escolhida pelas regras
+    while not game.game_over:
+        if not game.prepare_turn():
+            continue
+        code = next(plays, None)
+        idx, side = (None, None) if code is None else (code >> 1, 'right' if code & 1 else 'left')
+        if (idx, side) not in bitboard.get_valid_moves(game.current_player.hand_mask, game.ends):
+            raise ValueError(f"jogada inválida no turno {game.turns}: {(idx, side)}")
+        piece = next(p for p in game.current_player.pieces if p.index == idx)
+        game.play(piece, side)
+
+    winner = game.players.index(game.winner) if game.winner is not None else None
+    if (bytes(encode_event(event) for event in game.history) != record.events
+            or (winner, game.end_reason, game.turns) != (record.winner, record.reason, record.turns)):
+        raise ValueError("a partida refeita não corresponde ao registro")
+    return game
+
+def _verified(records):
+    """Refaz cada registro antes de repassá-lo (ver replay)."""
+    for record in records:
+        replay(record)
+        yield record
+
+def summarize(records):
+    """Agrega registros em vitórias por lugar na mesa, travamentos, turnos e eventos."""
+    summary = {'games': 0, 'wins': [0, 0], 'blocked': 0, 'turns': 0, 'draws': 0, 'passes': 0}
+    for record in records:
+        summary['games'] += 1
+        if len(summary['wins']) < len(record.hands):
+            summary['wins'] += [0] * (len(record.hands) - len(summary['wins']))
+        if record.winner is not None:
+            summary['wins'][record.winner] += 1
+        summary['blocked'] += record.reason == 'blocked'
+        summary['turns'] += record.turns
+        summary['draws'] += record.events.count(DRAW)
+        summary['passes'] += record.events.count(PASS)
+    if summary['games']:
+        summary['avg_turns'] = summary['turns'] / summary['games']
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lê, confere e refaz partidas gravadas (ver simulate.py --record).")
+    parser.add_argument('path', help="arquivo de registros")
+    parser.add_argument('--replay', type=int, metavar='N', help="refaz a N-ésima partida (a partir de 0) com saída")
+    parser.add_argument('--verify', action='store_true', help="refaz todas as partidas e confere os registros")
+    args = parser.parse_args(argv)
+
+    if args.replay is not None:
+        count = 0
+        for record in iter_records(args.path):
+            if count == args.replay:
+                print(json.dumps(replay(record, verbose=True).result()))
+                return 0
+            count += 1
+        print(f"O arquivo tem só {count} partidas.", file=sys.stderr)
+        return 1
+
+    records = iter_records(args.path)
+    if args.verify:
+        records = _verified(records)
+    print(json.dumps(summarize(records)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bitboard
+from game import DominoGame
+from player import GreedyPlayer, Player, RandomPlayer
+from utils import generate_domino_set, shuffle_and_distribute
+
+# Servidor assíncrono de mesas de dominó. Cada mesa é uma corrotina que conduz
+# um DominoGame pela API de turnos (begin, prepare_turn, play); as jogadas vêm
+# de clientes assíncronos. A busca da IA roda em um pool de processos, de modo
+# que uma busca lenta nunca segura as outras mesas do laço de eventos.
+
+def _ai_decision(task):
+    """Escolhe a jogada da IA em um processo do pool. Retorna (índice da peça, lado) ou None."""
+    ends, hand_mask, opponent_mask, belief, stock_size, root_first, difficulty, samples, seed, weights = task
+    pieces = bitboard.mask_to_pieces(hand_mask)
+    if belief is None:
+        from ai import find_best_move
+
+        move = find_best_move([], ends, pieces, bitboard.mask_to_pieces(opponent_mask), difficulty,
+                              stock_size=stock_size, root_first=root_first, in_place=difficulty != 1, weights=weights)
+    else:
+        from determinization import find_best_move_imperfect
+
+        move = find_best_move_imperfect(ends, pieces, belief, difficulty, samples, rng=random.Random(seed),
+                                        root_first=root_first, in_place=difficulty != 1, weights=weights)
+    if move is None:
+        return None
+    return move[0].index, move[1]
+
+class LocalClient:
+    """
+    Cliente local: um jogador síncrono (RandomPlayer, GreedyPlayer, ...) decide
+    no próprio laço de eventos. delay (segundos) simula o tempo de resposta de um
+    cliente remoto, sorteado entre 0 e 2 * delay.
+    """
+
+    def __init__(self, player_class=RandomPlayer, delay=0.0, rng=random):
+        self.player_class = player_class
+        self.delay = delay
+        self.rng = rng
+
+    def create_player(self, name, pieces):
+        return self.player_class(name, pieces)
+
+    async def decide(self, game, player):
+        if self.delay:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.delay))
+        return player.make_move(game)
+
+    async def finish(self, game, player):
+        pass
+
+class AIClient:
+    """
+    Cliente IA: a busca roda em executor (um ProcessPoolExecutor compartilhado
+    entre as mesas). Sem executor, a busca roda no laço de eventos e bloqueia as
+    outras mesas enquanto dura.
+    """
+
+    def __init__(self, executor=None, difficulty=2, samples=16, perfect_information=False, seed=0):
+        self.executor = executor
+        self.difficulty = difficulty
+        self.samples = samples
+        self.perfect_information = perfect_information
+        self.seed = seed
+
+    def create_player(self, name, pieces):
+        return Player(name, pieces)
+
+    async def decide(self, game, player):
+        moves = player.get_valid_moves(game.ends)
+        if not moves:
+            return None, None
+        if len(moves) == 1:
+            return moves[0][1], moves[0][2]
+
+        opponent = game.get_opponent(player)
+        belief = None
+        if not self.perfect_information:
+            from determinization import Belief
+
+            belief = Belief.from_game(game, player)
+        weights = None
+        if game.max_dots != 6:
+            from ai import eval_weights, weights_for_set
+
+            weights = weights_for_set(eval_weights(self.difficulty), game.max_dots)
+        task = (game.ends, player.hand_mask, opponent.hand_mask, belief, len(game.stock),
+                game.players[0] is player, self.difficulty, self.samples, self.seed * 1000 + game.turns, weights)
+        if self.executor is None:
+            move = _ai_decision(task)
+        else:
+            move = await asyncio.get_running_loop().run_in_executor(self.executor, _ai_decision, task)
+
+        idx, side = move
+        for piece in player.pieces:
+            if piece.index == idx:
+                return piece, side
+
+    async def finish(self, game, player):
+        pass
+
+class StreamClient:
+    """
+    Cliente remoto que troca linhas JSON por um par asyncio StreamReader/StreamWriter.
+
+    A cada turno o servidor envia {"type": "turn", "ends", "hand", "moves",
+    "opponent_tiles", "stock"} e espera {"move": i}, o índice da jogada escolhida
+    em "moves" (cada uma [esquerda, direita, lado]). Uma resposta inválida recebe
+    {"type": "error"} e a pergunta é repetida até max_attempts vezes; depois
+    disso, ou se a conexão cair, joga-se a primeira jogada válida.
+    """
+
+    def __init__(self, reader, writer, max_attempts=3):
+        self.reader = reader
+        self.writer = writer
+        self.max_attempts = max_attempts
+        self.connected = True
+
+    def create_player(self, name, pieces):
+        return Player(name, pieces)
+
+    async def _send(self, message):
+        self.writer.write((json.dumps(message) + '\n').encode())
+        await self.writer.drain()
+
+    async def decide(self, game, player):
+        moves = player.get_valid_moves(game.ends)
+        if not moves:
+            return None, None
+        message = {
+            'type': 'turn',
+            'ends': list(game.ends),
+            'hand': [[p.left, p.right] for p in player.pieces],
+            'moves': [[piece.left, piece.right, side] for _, piece, side in moves],
+            'opponent_tiles': len(game.get_opponent(player).pieces),
+            'stock': len(game.stock),
+        }
+        for _ in range(self.max_attempts if self.connected else 0):
+            try:
+                await self._send(message)
+                line = await self.reader.readline()
+            except (ConnectionError, OSError):
+                self.connected = False
+                break
+            if not line:
+                self.connected = False
+                break
+            try:
+                choice = int(json.loads(line)['move'])
+            except (ValueError, KeyError, TypeError):
+                choice = -1
+            if 0 <= choice < len(moves):
+                return moves[choice][1], moves[choice][2]
+            await self._send({'type': 'error', 'message': 'jogada inválida'})
+        return moves[0][1], moves[0][2]
+
+    async def finish(self, game, player):
+        if self.connected:
+            try:
+                await self._send({'type': 'result', **game.result()})
+            except (ConnectionError, OSError):
+                pass
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+class GameServer:
+    """
+    Conduz muitas mesas ao mesmo tempo em um laço asyncio.
+
+    max_tables limita as mesas em andamento; as demais esperam a vez. O tempo
+    de cada decisão (do pedido ao cliente até a jogada) é guardado em
+    latencies, para stats().
+    """
+
+    def __init__(self, max_tables=1000, max_dots=6, pieces_per_player=7):
+        self.max_dots = max_dots
+        self.pieces_per_player = pieces_per_player
+        self.latencies = []
+        self.tables = 0
+        self.moves = 0
+        self._slots = asyncio.Semaphore(max_tables)
+
+    async def run_table(self, seed, clients):
+        """Joga uma partida entre os dois clientes com a distribuição da semente e retorna o resumo."""
+        async with self._slots:
+            rng = random.Random(seed)
+            hands, stock = shuffle_and_distribute(generate_domino_set(self.max_dots),
+                                                  pieces_per_player=self.pieces_per_player, rng=rng)
+            players = [client.create_player(name, hand) for client, name, hand in zip(clients, 'ab', hands)]
+            game = DominoGame(players, stock, verbose=False, interactive=False)
+
+            game.begin()
+            while not game.game_over:
+                if game.prepare_turn():
+                    start = time.perf_counter()
+                    piece, side = await clients[game.current_player_idx].decide(game, game.current_player)
+                    self.latencies.append(time.perf_counter() - start)
+                    self.moves += 1
+                    game.play(piece, side)
+                else:
+                    await asyncio.sleep(0)  # um passe não espera ninguém: cede a vez às outras mesas
+
+            for client, player in zip(clients, players):
+                await client.finish(game, player)
+            self.tables += 1
+            result = game.result()
+            result['seed'] = seed
+            return result
+
+    def stats(self):
+        """Decisões e percentis de latência das decisões (em milissegundos)."""
+        latencies = sorted(self.latencies)
+        return {
+            'tables': self.tables,
+            'moves': self.moves,
+            'latency_ms': {name: round(_percentile(latencies, q) * 1000, 3)
+                           for name, q in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('max', 1.0))},
+        }
+
+    async def serve_tcp(self, host, port, opponent):
+        """
+        Aceita conexões TCP; cada conexão joga uma partida (StreamClient) contra o
+        cliente retornado por opponent(). Roda até ser cancelado.
+        """
+        seeds = iter(range(1 << 62))
+
+        async def handle(reader, writer):
+            try:
+                await self.run_table(next(seeds), [StreamClient(reader, writer), opponent()])
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+def client_factory(spec, executor=None, delay=0.0):
+    """
+    Converte uma descrição textual em uma função sem argumentos que cria um cliente.
+
+    Formatos: 'random', 'greedy' (clientes locais com atraso delay) e
+    'ai:<dificuldade>' ou 'ai:<dificuldade>:perfect' (IA no executor).
+    """
+    parts = spec.split(':')
+    if parts[0] in ('random', 'greedy'):
+        player_class = RandomPlayer if parts[0] == 'random' else GreedyPlayer
+        return lambda: LocalClient(player_class, delay)
+    if parts[0] == 'ai':
+        difficulty = int(parts[1]) if len(parts) > 1 else 2
+        perfect = 'perfect' in parts[2:]
+        seeds = iter(range(1 << 62))
+        return lambda: AIClient(executor, difficulty, perfect_information=perfect, seed=next(seeds))
+    raise ValueError(f"Cliente desconhecido: {spec}")
+
+async def load_test(tables, factory_a, factory_b, max_tables=1000, seed=0):
+    """
+    Gerador de carga: joga tables partidas entre clientes locais, com até
+    max_tables simultâneas, e retorna o resumo de vazão e latência.
+    """
+    server = GameServer(max_tables)
+    start = time.perf_counter()
+    await asyncio.gather(*(server.run_table(seed + i, [factory_a(), factory_b()]) for i in range(tables)))
+    elapsed = time.perf_counter() - start
+
+    summary = server.stats()
+    summary['seconds'] = round(elapsed, 3)
+    summary['tables_per_sec'] = round(tables / elapsed, 2)
+    summary['moves_per_sec'] = round(server.moves / elapsed, 2)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor assíncrono de mesas de dominó.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('load', help="gerador de carga com clientes locais")
+    load.add_argument('-n', '--tables', type=int, default=1000)
+    load.add_argument('-c', '--concurrency', type=int, default=500, help="mesas simultâneas")
+    load.add_argument('-a', default='greedy', help="cliente a (random, greedy, ai:N, ai:N:perfect)")
+    load.add_argument('-b', default='ai:2', help="cliente b")
+    load.add_argument('--delay', type=float, default=0.0, help="atraso médio simulado dos clientes locais (s)")
+    load.add_argument('-p', '--processes', type=int, default=None, help="processos para a IA")
+    load.add_argument('--seed', type=int, default=0)
+
+    serve = commands.add_parser('serve', help="aceita partidas por TCP (linhas JSON) contra a IA")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--ai', default='ai:2', help="oponente (random, greedy, ai:N, ai:N:perfect)")
+    serve.add_argument('-c', '--concurrency', type=int, default=1000)
+    serve.add_argument('-p', '--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    with ProcessPoolExecutor(args.processes) as executor:
+        if args.command == 'load':
+            summary = asyncio.run(load_test(args.tables, client_factory(args.a, executor, args.delay),
+                                            client_factory(args.b, executor, args.delay), args.concurrency,
+                                            args.seed))
+            print(json.dumps(summary))
+        else:
+            server = GameServer(args.concurrency)
+            try:
+                asyncio.run(server.serve_tcp(args.host, args.port, client_factory(args.ai, executor)))
+            except KeyboardInterrupt:
+                pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import functools
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+from game import DRAW_RULES, DominoGame
+from player import AIPlayer, GreedyPlayer, RandomPlayer
+from utils import generate_domino_set, hand_size, shuffle_and_distribute
+
+# Simulação em lote de partidas entre jogadores automáticos, sem nenhuma entrada
+# ou saída no terminal. Cada partida é reproduzível a partir da sua semente.
+
+def player_factory(spec):
+    """
+    Converte uma descrição textual em uma fábrica de jogadores (name, pieces, rng=None) -> Player.
+
+    Formatos aceitos: 'random', 'greedy' e 'ai:<dificuldade>', seguido
+    opcionalmente de ':perfect' (IA que vê a mão do oponente), ':inplace' (busca
+    de inplace.py), ':maxn' (busca max^n em mesas de mais de dois), ':book=<arquivo>' (livro de aberturas de book.py),
+    ':cache=<arquivo>' (cache de posições de poscache.py) e/ou
+    ':weights=<arquivo>' (pesos da avaliação, ver tune.py). As fábricas
+    retornadas podem ser enviadas a outros processos.
+    """
+    parts = spec.split(':')
+    if parts[0] == 'random':
+        return RandomPlayer
+    if parts[0] == 'greedy':
+        return GreedyPlayer
+    if parts[0] == 'ai':
+        difficulty = int(parts[1]) if len(parts) > 1 else 2
+        perfect = 'perfect' in parts[2:]
+        in_place = 'inplace' in parts[2:]
+        algorithm = 'maxn' if 'maxn' in parts[2:] else 'paranoid'
+        book = cache = weights = None
+        for part in parts[2:]:
+            if part.startswith('book='):
+                from book import OpeningBook
+                
+                book = OpeningBook(part[len('book='):])
+            elif part.startswith('cache='):
+                from poscache import PositionCache
+                
+                cache = PositionCache(part[len('cache='):])
+            elif part.startswith('weights='):
+                from tune import load_weights
+                
+                weights = load_weights(part[len('weights='):], difficulty)
+        return functools.partial(AIPlayer, difficulty=difficulty, perfect_information=perfect, in_place=in_place,
+                                 book=book, cache=cache, weights=weights, algorithm=algorithm)
+    raise ValueError(f"Jogador desconhecido: {spec}")
+
+def play_game(seed, factory_a, factory_b, max_dots=6, pieces_per_player=7, swap_seats=False, record=False,
+              draw_rule='one', auto_forced=False, players=2, teams=False):
+    """
+    Joga uma partida silenciosa entre os jogadores 'a' e 'b' e retorna o resumo.
+
+    A mesma semente produz sempre a mesma distribuição e as mesmas escolhas
+    aleatórias. Com swap_seats=True, 'b' ocupa o primeiro lugar da mesa. Com
+    record=True, o resumo traz em 'record' o registro binário da partida (ver
+    records.py). draw_rule e auto_forced são repassados a DominoGame.
+
+    Com players > 2 os lugares alternam jogadores de factory_a e factory_b
+    ('a1', 'b1', 'a2', ...; swap_seats gira a mesa em um lugar) e 'winner' é o
+    lado vencedor, 'a' ou 'b'. Com teams=True os jogadores de cada lado formam
+    um time.
+    """
+    rng = random.Random(seed)  # distribuição e escolhas aleatórias dos jogadores
+    hands, stock = shuffle_and_distribute(generate_domino_set(max_dots), player_count=players,
+                                          pieces_per_player=pieces_per_player, rng=rng)
+
+    names = ['ab'[i % 2] + (str(i // 2 + 1) if players > 2 else '') for i in range(players)]
+    factories = (factory_a, factory_b)
+    created = [factories[i % 2](name, hand, rng=rng) for i, (name, hand) in enumerate(zip(names, hands))]
+    seats = created[1:] + created[:1] if swap_seats else created
+    if record:
+        from records import GameRecord
+        
+        game_record = GameRecord.from_deal([seat.pieces for seat in seats], stock, seed)
+
+    seat_teams = [int(seat.name[0] == 'b') for seat in seats] if teams else None
+    start = time.perf_counter()
+    game = DominoGame(seats, stock, teams=seat_teams, verbose=False, interactive=False, draw_rule=draw_rule,
+                      auto_forced=auto_forced)
+    result = game.start()
+    result['seconds'] = round(time.perf_counter() - start, 6)
+    result['seed'] = seed
+    result['seats'] = [player.name for player in seats]
+    winner = result.pop('winner_name')
+    if players == 2:
+        result['winner'] = winner
+    else:
+        result['winner_name'] = winner
+        if teams:
+            result['winner'] = 'ab'[result['team']]
+        else:
+            result['winner'] = winner[0] if winner is not None else None
+    if record:
+        result['record'] = game_record.finish(game).encode()
+    return result
+
+def _play_game_task(args):
+    return play_game(*args)
+
+def run_games(games, factory_a, factory_b, seed=0, processes=1, max_dots=6, pieces_per_player=7, record=False,
+              draw_rule='one', auto_forced=False, players=2, teams=False):
+    """
+    Gera os resumos de games partidas, na ordem das sementes seed, seed+1, ...
+
+    Os lugares na mesa se alternam a cada partida. Com processes > 1 as partidas
+    são distribuídas entre processos, e os resultados continuam saindo em ordem.
+    """
+    tasks = [(seed + i, factory_a, factory_b, max_dots, pieces_per_player, i % 2 == 1, record, draw_rule,
+              auto_forced, players, teams)
+             for i in range(games)]
+    if processes <= 1:
+        for task in tasks:
+            yield _play_game_task(task)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        chunksize = max(1, games // (processes * 8))
+        for result in pool.imap(_play_game_task, tasks, chunksize):
+            yield result
+
+def summarize(results):
+    """Agrega uma sequência de resumos em vitórias, travamentos e médias."""
+    summary = {'games': 0, 'wins': {'a': 0, 'b': 0}, 'blocked': 0, 'turns': 0, 'seconds': 0.0}
+    for result in results:
+        summary['games'] += 1
+        if result['winner'] in summary['wins']:
+            summary['wins'][result['winner']] += 1
+        if result['reason'] == 'blocked':
+            summary['blocked'] += 1
+        summary['turns'] += result['turns']
+        summary['seconds'] += result['seconds']
+    if summary['games']:
+        summary['avg_turns'] = summary['turns'] / summary['games']
+        summary['avg_seconds'] = summary['seconds'] / summary['games']
+    return summary
+
+def _write_results(results, out, recorder=None):
+    """
+    Escreve cada resumo como uma linha JSON à medida que fica pronto, e o
+    registro da partida em recorder (um records.RecordWriter), se houver.
+    """
+    for result in results:
+        if recorder is not None:
+            recorder.write(result.pop('record'))
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+        yield result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simula partidas de dominó entre jogadores automáticos.")
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('-a', default='ai:3', help="jogador a (random, greedy, ai:N, ai:N:perfect, ai:N:inplace)")
+    parser.add_argument('-b', default='ai:2', help="jogador b")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-p', '--processes', type=int, default=1)
+    parser.add_argument('--max-dots', type=int, default=6, help="conjunto duplo-N (6, 9 ou 12)")
+    parser.add_argument('--pieces', type=int, help="peças por jogador (padrão: 7, 10 ou 12 conforme o conjunto)")
+    parser.add_argument('-o', '--output', help="arquivo JSONL com um resumo por partida (padrão: saída padrão)")
+    parser.add_argument('--record', metavar='FILE', help="grava o registro binário das partidas (ver records.py)")
+    parser.add_argument('--draw-rule', choices=DRAW_RULES, default='one', help="regra de compra (padrão: one)")
+    parser.add_argument('--auto-forced', action='store_true', help="jogadas únicas são feitas sem consultar o jogador")
+    parser.add_argument('--players', type=int, default=2, help="jogadores na mesa, alternando a e b (padrão: 2)")
+    parser.add_argument('--teams', action='store_true', help="os jogadores a e os jogadores b formam dois times")
+    args = parser.parse_args(argv)
+    pieces = args.pieces if args.pieces is not None else hand_size(args.max_dots)
+
+    results = run_games(args.games, player_factory(args.a), player_factory(args.b), args.seed,
+                        args.processes, args.max_dots, pieces, record=args.record is not None,
+                        draw_rule=args.draw_rule, auto_forced=args.auto_forced, players=args.players,
+                        teams=args.teams)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    recorder = None
+    if args.record:
+        from records import RecordWriter
+        
+        recorder = RecordWriter(args.record)
+    try:
+        summary = summarize(_write_results(results, out, recorder))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if recorder is not None:
+            recorder.close()
+    print(json.dumps(summary), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import random
+import unittest
+
+import bitboard
+from ai import (DEFAULT_WEIGHTS, DifficultyLevel, EvalAggregates, EvalWeights, evaluate_mask_state, evaluate_state,
+                weights_for_set)
+from piece import DominoPiece
+from utils import generate_domino_set, hand_size
+
+
+def _pieces(mask):
+    return [DominoPiece(bitboard.TILE_LOW[idx], bitboard.TILE_HIGH[idx]) for idx in bitboard.iter_tiles(mask)]
+
+
+class EvalAggregatesTest(unittest.TestCase):
+
+    def _check_random_walks(self, max_dots, weights, difficulty, rng, walks=40, steps=30):
+        tiles = [piece.index for piece in generate_domino_set(max_dots)]
+        size = hand_size(max_dots)
+        for _ in range(walks):
+            chosen = rng.sample(tiles, 2 * size)
+            masks = [sum(1 << idx for idx in chosen[:size]), sum(1 << idx for idx in chosen[size:])]
+            aggregates = EvalAggregates(masks[0], masks[1], difficulty, weights)
+            removed = []
+            for _ in range(steps):
+                # Tira uma peça de uma das mãos ou desfaz a última retirada, como na busca
+                owner = rng.randrange(2)
+                if removed and (not masks[owner] or rng.random() < 0.4):
+                    owner, idx = removed.pop()
+                    aggregates.restore(owner, idx)
+                    masks[owner] |= 1 << idx
+                elif masks[owner]:
+                    idx = rng.choice(list(bitboard.iter_tiles(masks[owner])))
+                    aggregates.remove(owner, idx)
+                    masks[owner] &= ~(1 << idx)
+                    removed.append((owner, idx))
+                expected = evaluate_state(_pieces(masks[0]), _pieces(masks[1]), difficulty, weights)
+                self.assertEqual(evaluate_mask_state(masks[0], masks[1], difficulty, weights), expected)
+                self.assertEqual(aggregates.evaluate(), expected)
+
+    def test_matches_full_evaluation(self):
+        rng = random.Random(14)
+        tuned = EvalWeights(1, 3.5, 6.0, 1.5, 2.5)
+        for max_dots in (6, 9, 12):
+            for difficulty in (DifficultyLevel.EASY, DifficultyLevel.MEDIUM, DifficultyLevel.HARD):
+                with self.subTest(max_dots=max_dots, difficulty=difficulty):
+                    weights = weights_for_set(DEFAULT_WEIGHTS[difficulty], max_dots)
+                    self._check_random_walks(max_dots, weights, difficulty, rng)
+            with self.subTest(max_dots=max_dots, weights=tuned):
+                self._check_random_walks(max_dots, weights_for_set(tuned, max_dots), DifficultyLevel.HARD, rng)
+
+    def test_default_weights(self):
+        self._check_random_walks(6, None, DifficultyLevel.HARD, random.Random(6))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import random
+import unittest
+
+import bitboard
+from endgame import ENDGAME_TILE_THRESHOLD, EndgameSolver
+
+
+def _brute_force_winner(hands, ends, mover, passed, first):
+    """
+    Lugar (0 ou 1) que vence com jogo perfeito, percorrendo a árvore inteira sem
+    memorização. hands são listas de peças (a, b); first é quem senta primeiro.
+    """
+    hand = hands[mover]
+    other = 1 - mover
+    results = []
+    for tile in hand:
+        a, b = tile
+        for side in (0, 1):
+            end = ends[side]
+            if end not in tile:
+                continue
+            new_ends = list(ends)
+            new_ends[side] = b if a == end else a
+            rest = [piece for piece in hand if piece != tile]
+            if not rest:
+                return mover
+            new_hands = [None, None]
+            new_hands[mover], new_hands[other] = rest, hands[other]
+            results.append(_brute_force_winner(new_hands, tuple(new_ends), other, False, first))
+    if results:
+        return mover if mover in results else other
+    if not passed:
+        return _brute_force_winner(hands, ends, other, True, first)
+    sums = [sum(a + b for a, b in hands[seat]) for seat in (0, 1)]
+    if sums[0] == sums[1]:
+        return first
+    return 0 if sums[0] < sums[1] else 1
+
+
+def _tiles(mask):
+    return [(bitboard.TILE_LOW[idx], bitboard.TILE_HIGH[idx]) for idx in bitboard.iter_tiles(mask)]
+
+
+class EndgameSolverTest(unittest.TestCase):
+
+    def _random_position(self, rng, max_dots=6):
+        tiles = [idx for idx in range(bitboard.TILE_COUNT) if bitboard.TILE_HIGH[idx] <= max_dots]
+        total = rng.randint(2, ENDGAME_TILE_THRESHOLD)
+        split = rng.randint(1, total - 1)
+        chosen = rng.sample(tiles, total)
+        player_mask = sum(1 << idx for idx in chosen[:split])
+        opponent_mask = sum(1 << idx for idx in chosen[split:])
+        ends = (rng.randint(0, max_dots), rng.randint(0, max_dots))
+        return ends, player_mask, opponent_mask
+
+    def test_matches_brute_force(self):
+        rng = random.Random(10)
+        solver = EndgameSolver()  # reaproveitado, como numa partida
+        for _ in range(300):
+            ends, player_mask, opponent_mask = self._random_position(rng)
+            root_first = rng.random() < 0.5
+            first = 0 if root_first else 1
+            hands = [_tiles(player_mask), _tiles(opponent_mask)]
+            with self.subTest(ends=ends, hands=hands, root_first=root_first):
+                expected = _brute_force_winner(hands, ends, 0, False, first) == 0
+                self.assertEqual(solver.wins(ends, player_mask, opponent_mask, root_first=root_first), expected)
+
+                moves = bitboard.get_valid_moves(player_mask, ends)
+                winning = []
+                for idx, side in moves:
+                    new_mask, new_ends = bitboard.apply_move(player_mask, idx, side, ends)
+                    if not new_mask or _brute_force_winner([_tiles(new_mask), hands[1]], new_ends, 1, False,
+                                                           first) == 0:
+                        winning.append((idx, side))
+                self.assertEqual(solver.winning_moves(ends, player_mask, opponent_mask, root_first), winning)
+                if moves:  # sem jogada, a raiz passa e ainda pode vencer
+                    self.assertEqual(bool(winning), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
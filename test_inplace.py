@@ -0,0 +1,59 @@
+import random
+import unittest
+
+import ai
+import bitboard
+from ai import DifficultyLevel, SearchStats, TranspositionTable, weights_for_set
+from inplace import InPlaceSearch
+
+
+def _random_positions(rng, count, max_dots=6):
+    """Posições sorteadas: (extremidades, mão de quem joga, mão do oponente)."""
+    tiles = [idx for idx in range(bitboard.TILE_COUNT) if bitboard.TILE_HIGH[idx] <= max_dots]
+    positions = []
+    for _ in range(count):
+        chosen = rng.sample(tiles, rng.randint(2, 14))
+        split = rng.randint(1, len(chosen) - 1)
+        ends = (None, None) if rng.random() < 0.1 else (rng.randint(0, max_dots), rng.randint(0, max_dots))
+        positions.append((ends, sum(1 << idx for idx in chosen[:split]), sum(1 << idx for idx in chosen[split:])))
+    return positions
+
+
+class InPlaceSearchTest(unittest.TestCase):
+
+    def _compare(self, difficulty, positions, depth, weights=None):
+        # Uma tabela para cada busca, reaproveitada entre as posições como numa partida
+        table, in_place_table = TranspositionTable(), TranspositionTable()
+        stats, in_place_stats = SearchStats(), SearchStats()
+        engine = InPlaceSearch(difficulty, in_place_table, in_place_stats, weights)
+        for ends, player_mask, opponent_mask in positions:
+            with self.subTest(ends=ends, player_mask=player_mask, opponent_mask=opponent_mask):
+                stats.__init__()
+                in_place_stats.__init__()
+                table.new_search()
+                in_place_table.new_search()
+                expected = ai.search_root(ends, player_mask, opponent_mask, depth, difficulty, table, stats=stats,
+                                          weights=weights)
+                self.assertEqual(engine.search(ends, player_mask, opponent_mask, depth), expected)
+                self.assertEqual(in_place_stats.nodes, stats.nodes)
+
+                table.new_search()
+                in_place_table.new_search()
+                expected = ai.score_root_moves(ends, player_mask, opponent_mask, depth, difficulty, table,
+                                               weights=weights)
+                self.assertEqual(engine.score_moves(ends, player_mask, opponent_mask, depth), expected)
+
+    def test_matches_search_root(self):
+        rng = random.Random(15)
+        for difficulty in (DifficultyLevel.MEDIUM, DifficultyLevel.HARD):
+            self._compare(difficulty, _random_positions(rng, 60), ai.get_search_depth(difficulty))
+
+    def test_matches_search_root_larger_sets(self):
+        rng = random.Random(9)
+        for max_dots in (9, 12):
+            weights = weights_for_set(ai.DEFAULT_WEIGHTS[DifficultyLevel.HARD], max_dots)
+            self._compare(DifficultyLevel.HARD, _random_positions(rng, 20, max_dots), 4, weights)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import json
+import os
+import tempfile
+import unittest
+
+from ai import DEFAULT_WEIGHTS, DifficultyLevel, EvalWeights
+from tune import load_weights
+
+
+class LoadWeightsTest(unittest.TestCase):
+
+    def _write(self, data):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_partial_file_keeps_default_terms(self):
+        path = self._write({'count': 2.5})
+        weights = load_weights(path, DifficultyLevel.HARD)
+        self.assertEqual(weights, DEFAULT_WEIGHTS[DifficultyLevel.HARD]._replace(count=2.5))
+        self.assertEqual(weights.value, 1)
+
+    def test_checkpoint_weights(self):
+        tuned = EvalWeights(1, 3.5, 6.0, 1.0, 0.5)
+        path = self._write({'iteration': 3, 'weights': tuned._asdict()})
+        self.assertEqual(load_weights(path), tuned)
+
+
+if __name__ == '__main__':
+    unittest.main()
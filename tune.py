@@ -0,0 +1,164 @@
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from ai import DEFAULT_WEIGHTS, EvalWeights
+from player import AIPlayer
+from simulate import play_game
+
+# Ajuste dos pesos da avaliação (ai.EvalWeights) por SPSA sobre partidas de
+# autojogo.
+#
+# A cada iteração k, todos os pesos ajustados são perturbados ao mesmo tempo
+# por +c_k ou -c_k (sinais sorteados), e os dois vetores resultantes jogam entre
+# si pares de partidas: a mesma distribuição, uma vez em cada lugar da mesa. O
+# saldo de vitórias estima a derivada na direção sorteada, e os pesos andam
+# a_k vezes essa estimativa. value fica fixo em 1: multiplicar todos os pesos
+# por uma constante não muda nenhuma decisão, então ele só define a escala.
+#
+# As partidas de uma iteração são divididas em lotes de batch sementes, cada
+# lote uma tarefa de um pool de processos mantido durante todo o ajuste. O
+# estado é gravado em um arquivo de checkpoint ao fim de cada iteração; um
+# ajuste interrompido continua de onde parou. Cada iteração depende só da
+# semente e do número da iteração, de modo que o resultado não depende de
+# interrupções nem do número de processos.
+
+TUNED_TERMS = ('count', 'double', 'high_value', 'diversity')
+
+def _weights(theta):
+    return EvalWeights(1, *theta)
+
+def play_batch(task):
+    """
+    Joga, para cada semente do lote, um par de partidas entre weights_plus e
+    weights_minus (trocando os lugares). Retorna vitórias de plus menos
+    vitórias de minus.
+    """
+    weights_plus, weights_minus, difficulty, samples, perfect, seeds = task
+    factory_plus = functools.partial(AIPlayer, difficulty=difficulty, samples=samples,
+                                     perfect_information=perfect, weights=weights_plus)
+    factory_minus = functools.partial(AIPlayer, difficulty=difficulty, samples=samples,
+                                      perfect_information=perfect, weights=weights_minus)
+    score = 0
+    for seed in seeds:
+        for swap in (False, True):
+            result = play_game(seed, factory_plus, factory_minus, swap_seats=swap, auto_forced=True)
+            score += 1 if result['winner'] == 'a' else -1
+    return score
+
+def default_config(difficulty=2):
+    """Configuração padrão de um ajuste, partindo dos pesos padrão da dificuldade."""
+    return {
+        'difficulty': difficulty,
+        'initial': [getattr(DEFAULT_WEIGHTS[difficulty], term) for term in TUNED_TERMS],
+        'iterations': 100,
+        'pairs': 64,       # pares de partidas por iteração
+        'batch': 8,        # sementes por tarefa do pool
+        'samples': 8,      # determinizações por jogada (sem perfect)
+        'perfect': False,
+        'seed': 0,
+        'a': 4.0, 'c': 1.0, 'A': 10, 'alpha': 0.602, 'gamma': 0.101,
+    }
+
+def _save_checkpoint(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)  # um checkpoint nunca fica pela metade
+
+def load_weights(path, difficulty=2):
+    """
+    Lê um EvalWeights de um checkpoint de tune.py ou de um JSON {"count": ..., ...}.
+    Os termos ausentes do arquivo vêm dos pesos padrão da dificuldade.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    data = data.get('weights', data)
+    return DEFAULT_WEIGHTS[difficulty]._replace(**{field: data[field] for field in EvalWeights._fields
+                                                   if field in data})
+
+def spsa(config, checkpoint=None, processes=1, log=None):
+    """
+    Executa o ajuste descrito por config (ver default_config) e retorna o estado
+    final: {'config', 'iteration', 'theta', 'weights', 'history'}.
+
+    Se checkpoint existir, o ajuste continua a partir dele (valendo a
+    configuração gravada, exceto iterations); o estado é gravado nele a cada
+    iteração. log recebe uma linha JSON por iteração.
+    """
+    if checkpoint is not None and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        state['config']['iterations'] = config['iterations']
+        config = state['config']
+    else:
+        state = {'config': config, 'iteration': 0, 'theta': list(config['initial']), 'history': []}
+
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    try:
+        while state['iteration'] < config['iterations']:
+            k = state['iteration']
+            start = time.perf_counter()
+            a_k = config['a'] / (k + 1 + config['A']) ** config['alpha']
+            c_k = config['c'] / (k + 1) ** config['gamma']
+            rng = random.Random(config['seed'] * 1000003 + k)
+            delta = [rng.choice((-1, 1)) for _ in TUNED_TERMS]
+            theta = state['theta']
+            plus = _weights([t + c_k * d for t, d in zip(theta, delta)])
+            minus = _weights([t - c_k * d for t, d in zip(theta, delta)])
+
+            first_seed = config['seed'] * 1000003 + k * config['pairs']
+            seeds = list(range(first_seed, first_seed + config['pairs']))
+            tasks = [(plus, minus, config['difficulty'], config['samples'], config['perfect'],
+                      seeds[i:i + config['batch']]) for i in range(0, len(seeds), config['batch'])]
+            score = sum(pool.imap_unordered(play_batch, tasks) if pool is not None else map(play_batch, tasks))
+
+            result = score / (2 * len(seeds))  # saldo de vitórias por partida, entre -1 e 1
+            state['theta'] = [t + a_k * result / (c_k * d) for t, d in zip(theta, delta)]
+            state['iteration'] = k + 1
+            entry = {'iteration': k + 1, 'result': result, 'theta': state['theta'],
+                     'seconds': round(time.perf_counter() - start, 3)}
+            state['history'].append(entry)
+            state['weights'] = _weights(state['theta'])._asdict()
+            if checkpoint is not None:
+                _save_checkpoint(checkpoint, state)
+            if log is not None:
+                log.write(json.dumps(entry) + '\n')
+                log.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    state['weights'] = _weights(state['theta'])._asdict()
+    return state
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ajusta os pesos da avaliação por SPSA em partidas de autojogo.")
+    parser.add_argument('--checkpoint', help="arquivo de checkpoint (continua o ajuste se já existir)")
+    parser.add_argument('-d', '--difficulty', type=int, default=2, choices=(2, 3))
+    parser.add_argument('-n', '--iterations', type=int, default=100)
+    parser.add_argument('--pairs', type=int, default=64, help="pares de partidas por iteração")
+    parser.add_argument('--batch', type=int, default=8, help="sementes por tarefa do pool")
+    parser.add_argument('--samples', type=int, default=8, help="determinizações por jogada")
+    parser.add_argument('--perfect', action='store_true', help="IA com informação perfeita (mais rápido)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-p', '--processes', type=int, default=1)
+    parser.add_argument('-o', '--output', help="grava os pesos finais neste arquivo JSON")
+    args = parser.parse_args(argv)
+
+    config = default_config(args.difficulty)
+    config.update(iterations=args.iterations, pairs=args.pairs, batch=args.batch, samples=args.samples,
+                  perfect=args.perfect, seed=args.seed)
+    state = spsa(config, args.checkpoint, args.processes, log=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(state['weights'], f, indent=2)
+    print(json.dumps(state['weights']))
+
+if __name__ == "__main__":
+    main()
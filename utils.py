@@ -1,19 +1,34 @@
 import random
+
+import bitboard
 from piece import DominoPiece
 
+# Peças por jogador usadas por padrão em cada conjunto
+HAND_SIZES = {6: 7, 9: 10, 12: 12}
+
+def hand_size(max_dots):
+    """Peças por jogador para um conjunto duplo-max_dots (7 no duplo-6, 10 no duplo-9, 12 no duplo-12)."""
+    return HAND_SIZES.get(max_dots, 7)
+
 def generate_domino_set(max_dots=6):
-    """Gera um conjunto completo de peças de dominó."""
+    """Gera um conjunto completo de peças de dominó (até o duplo-12, ver bitboard.MAX_DOTS)."""
+    if not 0 <= max_dots <= bitboard.MAX_DOTS:
+        raise ValueError(f"Conjunto não suportado: duplo-{max_dots} (máximo duplo-{bitboard.MAX_DOTS})")
     dominoes = []
     for i in range(max_dots + 1):
         for j in range(i, max_dots + 1):
             dominoes.append(DominoPiece(i, j))
     return dominoes
 
-def shuffle_and_distribute(dominoes, player_count=2, pieces_per_player=7):
-    """Embaralha as peças e distribui entre os jogadores."""
+def shuffle_and_distribute(dominoes, player_count=2, pieces_per_player=7, rng=None):
+    """
+    Embaralha as peças e distribui entre os jogadores.
+
+    rng é um random.Random opcional, para distribuições reproduzíveis.
+    """
     # Cria uma cópia para evitar modificar o original
     dominoes = dominoes.copy()
-    random.shuffle(dominoes)
+    (rng or random).shuffle(dominoes)
     
     # Distribui as peças para os jogadores
     hands = []